@@ -0,0 +1,153 @@
+# Copyright (c) 2022 Victorien Elvinger
+# Licensed under the MIT License (https://mit-license.org/)
+
+"""
+On-disk cache of parsed schemas.
+
+Entries are keyed by a hash of the source and of the version of sqlschm.
+They are written atomically, so several processes can share a cache directory.
+The least recently used entries are evicted when the cache exceeds its size limit.
+
+Entries are serialized with `sql.dumps`.
+"""
+
+from dataclasses import dataclass
+import functools
+import hashlib
+import importlib.metadata
+import os
+import tempfile
+import time
+from sqlschm import sql
+from sqlschm.parser import parse_schema
+
+# Default maximum size in bytes of a cache directory
+MAX_SIZE: int = 1 << 28
+
+_SUFFIX = ".schema"
+_TMP_SUFFIX = ".tmp"
+# Age in seconds after which a temporary file is considered left by a dead writer
+_STALE_TMP_AGE = 3600.0
+
+
+@dataclass(frozen=True, kw_only=True, slots=True)
+class SchemaCache:
+    directory: str | os.PathLike[str]
+    max_size: int = MAX_SIZE
+
+    def parse_schema(self, src: str, /, *, ddl_only: bool = False) -> sql.Schema:
+        """Cached `parser.parse_schema`"""
+        return self._parse(src.encode("utf-8"), ddl_only)
+
+    def parse_schema_file(
+        self, path: str | os.PathLike[str], /, *, ddl_only: bool = False
+    ) -> sql.Schema:
+        """Cached `parser.parse_schema` of the UTF-8 encoded schema stored at `path`"""
+        with open(path, "rb") as fp:
+            return self._parse(fp.read(), ddl_only)
+
+    def clear(self, /) -> None:
+        """Remove all entries and stale temporary files"""
+        for entry in self._entries():
+            _remove(entry.path)
+        self._remove_stale_tmp_files()
+
+    def _parse(self, data: bytes, ddl_only: bool, /) -> sql.Schema:
+        digest = hashlib.sha256(_version().encode("utf-8"))
+        digest.update(b"\0ddl_only\0" if ddl_only else b"\0\0")
+        digest.update(data)
+        path = os.path.join(self.directory, digest.hexdigest() + _SUFFIX)
+        schema = _load(path)
+        if schema is None:
+            schema = parse_schema(data.decode("utf-8"), ddl_only=ddl_only)
+            self._store(path, schema)
+        return schema
+
+    def _store(self, path: str, schema: sql.Schema, /) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # Write in a temporary file of the cache directory and then move it:
+        # readers never see a partially written entry.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=_TMP_SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(sql.dumps(schema))
+            os.replace(tmp_path, path)
+        except BaseException:
+            _remove(tmp_path)
+            raise
+        self._evict()
+
+    def _evict(self, /) -> None:
+        """Remove the least recently used entries until the cache fits in `max_size`.
+
+        Stale temporary files are removed first.
+        """
+        self._remove_stale_tmp_files()
+        entries: list[tuple[float, int, str]] = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # removed by another process
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(entry_size for _, entry_size, _ in entries)
+        entries.sort()
+        for _, entry_size, entry_path in entries:
+            if size <= self.max_size:
+                break
+            _remove(entry_path)
+            size -= entry_size
+
+    def _remove_stale_tmp_files(self, /) -> None:
+        """Remove the temporary files of writers that died before moving them"""
+        expiration = time.time() - _STALE_TMP_AGE
+        for entry in self._entries(_TMP_SUFFIX):
+            try:
+                if entry.stat().st_mtime < expiration:
+                    _remove(entry.path)
+            except FileNotFoundError:
+                continue  # moved or removed by another process
+
+    def _entries(self, suffix: str = _SUFFIX, /) -> list[os.DirEntry[str]]:
+        try:
+            with os.scandir(self.directory) as it:
+                return [entry for entry in it if entry.name.endswith(suffix)]
+        except FileNotFoundError:
+            return []
+
+
+def _load(path: str, /) -> sql.Schema | None:
+    """Cached schema at `path` or None if it is missing or unreadable"""
+    try:
+        with open(path, "rb") as fp:
+            schema = sql.loads(fp.read())
+    except (OSError, ValueError):
+        return None
+    try:
+        # Mark the entry as recently used
+        os.utime(path)
+    except OSError:
+        pass  # e.g. a read-only cache: the hit is still valid
+    return schema
+
+
+def _remove(path: str, /) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@functools.cache
+def _version() -> str:
+    """Version of sqlschm, or a digest of its sources if it is not installed"""
+    try:
+        return importlib.metadata.version("sqlschm")
+    except importlib.metadata.PackageNotFoundError:
+        digest = hashlib.sha256()
+        package_dir = os.path.dirname(__file__)
+        for name in sorted(os.listdir(package_dir)):
+            if name.endswith(".py"):
+                with open(os.path.join(package_dir, name), "rb") as fp:
+                    digest.update(fp.read())
+        return digest.hexdigest()
@@ -0,0 +1,140 @@
+# Copyright (c) 2022 Victorien Elvinger
+# Licensed under the MIT License (https://mit-license.org/)
+
+"""
+In-memory store of the schemas of many databases.
+
+Schemas are stored by content: equal schemas, tables, and indexes are stored
+once, keyed by their structural fingerprint (see `sql.fingerprint`).
+Memory scales with the number of distinct tables instead of the number of
+databases times the number of tables.
+"""
+
+from dataclasses import dataclass
+from typing import Generic, Hashable, Iterable, Iterator, TypeVar
+from sqlschm import sql
+
+Key = TypeVar("Key", bound=Hashable)
+
+
+@dataclass(frozen=True, slots=True)
+class _Entry(Generic[Key]):
+    """A distinct schema and the keys of the databases that have it"""
+
+    schema: sql.Schema
+    item_fingerprints: tuple[bytes, ...]
+    keys: dict[Key, None]
+
+
+class SchemaCatalog(Generic[Key]):
+    """Schemas of databases identified by keys, e.g. tenant names.
+
+    Stored schemas share their equal tables and indexes:
+    they must not be mutated.
+    """
+
+    __slots__ = ("_schemas", "_entries", "_items", "_item_schemas", "_versions")
+    # Fingerprint of the schema of every key
+    _schemas: dict[Key, bytes]
+    _entries: dict[bytes, _Entry[Key]]
+    _items: dict[bytes, sql.SchemaItem]
+    # Fingerprints of the distinct schemas that contain an item
+    _item_schemas: dict[bytes, dict[bytes, None]]
+    # Fingerprints of the distinct tables by unqualified name
+    _versions: dict[str, dict[bytes, None]]
+
+    def __init__(self, /) -> None:
+        self._schemas = {}
+        self._entries = {}
+        self._items = {}
+        self._item_schemas = {}
+        self._versions = {}
+
+    def __len__(self, /) -> int:
+        return len(self._schemas)
+
+    def __iter__(self, /) -> Iterator[Key]:
+        return iter(self._schemas)
+
+    def __contains__(self, key: object, /) -> bool:
+        return key in self._schemas
+
+    def __getitem__(self, key: Key, /) -> sql.Schema:
+        return self._entries[self._schemas[key]].schema
+
+    def add(self, key: Key, schema: sql.Schema, /) -> sql.Schema:
+        """Store `schema` as the schema of `key` and return the stored schema.
+
+        The stored schema is equal to `schema` and shares its tables and
+        indexes with the other schemas of the catalog.
+        The previous schema of `key`, if any, is replaced.
+        """
+        if key in self._schemas:
+            self.remove(key)
+        schema_fp = sql.fingerprint(schema)
+        entry = self._entries.get(schema_fp)
+        if entry is None:
+            item_fps = tuple(map(sql.fingerprint, schema.items))
+            items = tuple(
+                self._items.setdefault(fp, item)
+                for fp, item in zip(item_fps, schema.items)
+            )
+            entry = _Entry(
+                schema=sql.Schema(items=items), item_fingerprints=item_fps, keys={}
+            )
+            self._entries[schema_fp] = entry
+            for fp, item in zip(item_fps, items):
+                self._item_schemas.setdefault(fp, {})[schema_fp] = None
+                if isinstance(item, sql.Table):
+                    self._versions.setdefault(item.name[0], {})[fp] = None
+        entry.keys[key] = None
+        self._schemas[key] = schema_fp
+        return entry.schema
+
+    def remove(self, key: Key, /) -> None:
+        """Remove the schema of `key`.
+
+        Raise KeyError if `key` has no schema.
+        Tables and indexes that are no longer used are released.
+        """
+        schema_fp = self._schemas.pop(key)
+        entry = self._entries[schema_fp]
+        del entry.keys[key]
+        if entry.keys:
+            return
+        del self._entries[schema_fp]
+        for fp, item in zip(entry.item_fingerprints, entry.schema.items):
+            schemas = self._item_schemas.get(fp)
+            if schemas is None:
+                continue  # item that is repeated in the schema
+            schemas.pop(schema_fp, None)
+            if not schemas:
+                del self._item_schemas[fp]
+                del self._items[fp]
+                if isinstance(item, sql.Table):
+                    versions = self._versions[item.name[0]]
+                    del versions[fp]
+                    if not versions:
+                        del self._versions[item.name[0]]
+
+    def tables(self, /) -> Iterable[sql.Table]:
+        """Distinct tables of the catalog"""
+        return (item for item in self._items.values() if isinstance(item, sql.Table))
+
+    def sharing(self, table: sql.Table, /) -> tuple[Key, ...]:
+        """Keys of the schemas that have a table equal to `table`"""
+        schema_fps = self._item_schemas.get(sql.fingerprint(table), {})
+        return tuple(
+            key for schema_fp in schema_fps for key in self._entries[schema_fp].keys
+        )
+
+    def versions(self, name: str, /) -> dict[sql.Table, tuple[Key, ...]]:
+        """Distinct tables with the unqualified name `name`.
+
+        Every table is mapped to the keys of the schemas that have it.
+        """
+        return {
+            table: self.sharing(table)
+            for table in (self._items[fp] for fp in self._versions.get(name, {}))
+            if isinstance(table, sql.Table)
+        }
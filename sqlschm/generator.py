@@ -5,7 +5,9 @@
 SQL schema printer.
 """
 
-from typing import Iterable
+import dataclasses
+import itertools
+from typing import Callable, Iterable, TypeVar
 import textwrap
 from sqlschm import sql, tok
 
@@ -20,6 +22,357 @@ def generate_schema(schema: sql.Schema, _dialect: sql.Dialect, /) -> str:
     return result.strip()
 
 
+def generate_migration(
+    old: sql.Schema, new: sql.Schema, _dialect: sql.Dialect, /
+) -> str:
+    """SQL script that migrates a database from the schema `old` to `new`.
+
+    A table or a column is renamed when it is dropped and added with the same
+    definition (at the same position for a column).
+    Columns are added and dropped with ALTER TABLE when SQLite allows it.
+    Otherwise, e.g. when the constraints or the options of a table change,
+    the table is rebuilt with the 12-step procedure of SQLite: the script
+    then disables foreign keys, and checks them before its final commit.
+    """
+    statements: list[str] = []
+    renamed = old
+    changes = sql.diff(renamed, new)
+    for old_table, new_table in _renamed_tables(
+        changes.dropped_tables, changes.added_tables
+    ):
+        table_name = _generate_qualified_name(old_table.name)
+        statements.append(
+            f"ALTER TABLE {table_name} RENAME TO {_generate_name(new_table.name[0])};"
+        )
+        renamed = _rename_table(renamed, old_table.name[0], new_table.name[0])
+    changes = sql.diff(renamed, new)
+    for table_diff in changes.modified_tables:
+        table_name = _generate_qualified_name(table_diff.old.name)
+        for old_col, new_col in _renamed_columns(table_diff):
+            statements.append(
+                f"ALTER TABLE {table_name}"
+                + f" RENAME COLUMN {_generate_name(old_col.name)}"
+                + f" TO {_generate_name(new_col.name)};"
+            )
+            renamed = _rename_column(
+                renamed, table_diff.old.name[0], old_col.name, new_col.name
+            )
+    changes = sql.diff(renamed, new)
+    created_indexes = changes.added_indexes + tuple(
+        index for _, index in changes.modified_indexes
+    )
+    for index in changes.dropped_indexes + tuple(
+        index for index, _ in changes.modified_indexes
+    ):
+        statements.append(f"DROP INDEX {_generate_qualified_name(index.name)};")
+    for table in changes.dropped_tables:
+        statements.append(f"DROP TABLE {_generate_qualified_name(table.name)};")
+    for table in changes.added_tables:
+        statements.append(_generate_create_table(table).strip())
+    rebuilt = False
+    for table_diff in changes.modified_tables:
+        alterations = _alter_table(table_diff, renamed, new)
+        if alterations is None:
+            rebuilt = True
+            statements += _rebuild_table(table_diff.old, table_diff.new)
+            created_indexes += tuple(
+                index
+                for index in new.indexes_for(table_diff.new.name[0])
+                if index not in created_indexes
+            )
+        else:
+            statements += alterations
+    for index in created_indexes:
+        statements.append(_generate_create_index(index).strip())
+    if rebuilt:
+        statements = (
+            ["PRAGMA foreign_keys=OFF;", "BEGIN;"]
+            + statements
+            + ["PRAGMA foreign_key_check;", "COMMIT;", "PRAGMA foreign_keys=ON;"]
+        )
+    return "\n".join(statements)
+
+
+def _renamed_tables(
+    dropped: tuple[sql.Table, ...], added: tuple[sql.Table, ...], /
+) -> Iterable[tuple[sql.Table, sql.Table]]:
+    """Pairs of a dropped and an added table that only differ by their names"""
+    added_by_definition: dict[sql.Table, list[sql.Table]] = {}
+    for table in added:
+        definition = dataclasses.replace(table, name=("",))
+        added_by_definition.setdefault(definition, []).append(table)
+    for table in dropped:
+        candidates = added_by_definition.get(dataclasses.replace(table, name=("",)))
+        if candidates:
+            yield table, candidates.pop(0)
+
+
+def _renamed_columns(
+    table_diff: sql.TableDiff, /
+) -> Iterable[tuple[sql.Column, sql.Column]]:
+    """Pairs of a dropped and an added column with the same definition and position"""
+    for old_col in table_diff.dropped_columns:
+        pos = table_diff.old.columns.index(old_col)
+        if pos < len(table_diff.new.columns):
+            new_col = table_diff.new.columns[pos]
+            if new_col in table_diff.added_columns and new_col == _rename_in_column(
+                old_col, old_col.name, new_col.name
+            ):
+                yield old_col, new_col
+
+
+def _alter_table(
+    table_diff: sql.TableDiff, old: sql.Schema, new: sql.Schema, /
+) -> list[str] | None:
+    """ALTER TABLE statements that apply `table_diff`, or None if SQLite cannot"""
+    old_table = table_diff.old
+    if (
+        table_diff.modified_columns
+        or table_diff.added_constraints
+        or table_diff.dropped_constraints
+        or old_table.options != table_diff.new.options
+    ):
+        return None
+    # ADD COLUMN appends columns: other column orders require a rebuild
+    dropped_names = {col.name for col in table_diff.dropped_columns}
+    altered_names = [
+        col.name for col in old_table.columns if col.name not in dropped_names
+    ] + [col.name for col in table_diff.added_columns]
+    if altered_names != [col.name for col in table_diff.new.columns]:
+        return None
+    table_name = _generate_qualified_name(old_table.name)
+    result: list[str] = []
+    # Columns are added first: SQLite cannot drop the last column of a table
+    for col in table_diff.added_columns:
+        if not _can_add_column(col):
+            return None
+        result.append(
+            f"ALTER TABLE {table_name} ADD COLUMN {_generate_column_def(col)};"
+        )
+    for col in table_diff.dropped_columns:
+        if not _can_drop_column(old_table, col.name, old, new):
+            return None
+        result.append(
+            f"ALTER TABLE {table_name} DROP COLUMN {_generate_name(col.name)};"
+        )
+    return result
+
+
+def _can_drop_column(
+    table: sql.Table, column: str, old: sql.Schema, new: sql.Schema, /
+) -> bool:
+    """Can SQLite drop `column` of `table` with ALTER TABLE?"""
+    if any(column in x.columns() for x in table.uniqueness()):
+        return False
+    if any(column in x.columns for x in table.foreign_keys()):
+        return False
+    for referrer in old.tables():
+        for fk in referrer.foreign_keys():
+            if fk.foreign_table[0] == table.name[0] and column in (
+                fk.referred_columns or ()
+            ):
+                return False
+    for index in new.indexes_for(table.name[0]):
+        if column in (x.column for x in index.indexed) or (
+            index.where is not None and _refers_to(index.where, column)
+        ):
+            return False
+    other_constraints = itertools.chain(
+        table.constraints,
+        *(col.constraints for col in table.columns if col.name != column),
+    )
+    return not any(
+        _refers_to(x.expr, column)
+        for x in other_constraints
+        if isinstance(x, (sql.Check, sql.Default, sql.Generated))
+    )
+
+
+def _can_add_column(col: sql.Column, /) -> bool:
+    """Can SQLite add `col` with ALTER TABLE?"""
+    if any(True for _ in sql.uniqueness(col.constraints)):
+        return False
+    generated = col.generated()
+    if generated is not None and generated.kind is sql.GeneratedKind.STORED:
+        return False
+    default = col.default()
+    default_expr = default.expr if default is not None else (tok.NULL,)
+    if not _is_constant(default_expr):
+        return False
+    is_null = default_expr == (tok.NULL,)
+    if col.not_null() is not None and is_null:
+        return False
+    # Required when foreign keys are enabled
+    return is_null or not any(True for _ in sql.foreign_keys(col.constraints))
+
+
+def _is_constant(expr: tuple[tok.Token, ...], /) -> bool:
+    """Is `expr` a literal that SQLite evaluates once?"""
+    return _is_literal(expr) and not any(x in _CURRENT_TIME_TOKENS for x in expr)
+
+
+_CURRENT_TIME_TOKENS = (tok.CURRENT_DATE, tok.CURRENT_TIME, tok.CURRENT_TIMESTAMP)
+
+
+def _rebuild_table(old: sql.Table, new: sql.Table, /) -> list[str]:
+    """Statements that rebuild `old` as `new` and copy the common columns"""
+    tmp_name = (f"new_{new.name[0]}",) + new.name[1:]
+    tmp_table = dataclasses.replace(new, name=tmp_name)
+    copied = ", ".join(
+        _generate_name(col.name)
+        for col in new.non_generated_columns()
+        if old.column(col.name) is not None
+    )
+    old_name = _generate_qualified_name(old.name)
+    tmp_qualified_name = _generate_qualified_name(tmp_name)
+    result = [_generate_create_table(tmp_table).strip()]
+    if copied:
+        result.append(
+            f"INSERT INTO {tmp_qualified_name}({copied}) SELECT {copied} FROM {old_name};"
+        )
+    result += [
+        f"DROP TABLE {old_name};",
+        f"ALTER TABLE {tmp_qualified_name} RENAME TO {_generate_name(new.name[0])};",
+    ]
+    return result
+
+
+def _rename_table(schema: sql.Schema, old: str, new: str, /) -> sql.Schema:
+    """`schema` after a rename of the table `old`, as done by SQLite"""
+
+    def rename_fk(fk: sql.ForeignKey) -> sql.ForeignKey:
+        if fk.foreign_table[0] != old:
+            return fk
+        return dataclasses.replace(fk, foreign_table=(new,) + fk.foreign_table[1:])
+
+    items: list[sql.SchemaItem] = []
+    for item in schema.items:
+        if isinstance(item, sql.Index):
+            if item.table == old:
+                item = dataclasses.replace(item, table=new)
+        else:
+            if item.name[0] == old:
+                item = dataclasses.replace(item, name=(new,) + item.name[1:])
+            item = _map_foreign_keys(item, rename_fk)
+        items.append(item)
+    return sql.Schema(items=tuple(items))
+
+
+_Constraint = TypeVar("_Constraint", bound=sql.ColumnConstraint)
+
+
+def _rename_column(schema: sql.Schema, table: str, old: str, new: str, /) -> sql.Schema:
+    """`schema` after a rename of the column `old` of `table`, as done by SQLite"""
+
+    def rename_referred(fk: sql.ForeignKey) -> sql.ForeignKey:
+        if fk.foreign_table[0] != table or fk.referred_columns is None:
+            return fk
+        referred_columns = _rename_in_names(fk.referred_columns, old, new)
+        return dataclasses.replace(fk, referred_columns=referred_columns)
+
+    items: list[sql.SchemaItem] = []
+    for item in schema.items:
+        if isinstance(item, sql.Index):
+            if item.table == table:
+                item = dataclasses.replace(
+                    item,
+                    indexed=_rename_in_indexed(item.indexed, old, new),
+                    where=(
+                        _rename_in_expr(item.where, old, new)
+                        if item.where is not None
+                        else None
+                    ),
+                )
+        else:
+            if item.name[0] == table:
+                item = dataclasses.replace(
+                    item,
+                    columns=tuple(
+                        _rename_in_column(col, old, new) for col in item.columns
+                    ),
+                    constraints=tuple(
+                        _rename_in_constraint(x, old, new) for x in item.constraints
+                    ),
+                )
+            item = _map_foreign_keys(item, rename_referred)
+        items.append(item)
+    return sql.Schema(items=tuple(items))
+
+
+def _rename_in_column(col: sql.Column, old: str, new: str, /) -> sql.Column:
+    """`col` where the column `old` of its table is renamed `new`"""
+    return dataclasses.replace(
+        col,
+        name=new if col.name == old else col.name,
+        constraints=tuple(_rename_in_constraint(x, old, new) for x in col.constraints),
+    )
+
+
+def _rename_in_constraint(x: _Constraint, old: str, new: str, /) -> _Constraint:
+    """`x` where the column `old` of its table is renamed `new`"""
+    if isinstance(x, sql.Uniqueness):
+        return dataclasses.replace(x, indexed=_rename_in_indexed(x.indexed, old, new))
+    if isinstance(x, sql.ForeignKey):
+        return dataclasses.replace(x, columns=_rename_in_names(x.columns, old, new))
+    if isinstance(x, (sql.Check, sql.Default, sql.Generated)):
+        return dataclasses.replace(x, expr=_rename_in_expr(x.expr, old, new))
+    return x
+
+
+def _rename_in_indexed(
+    indexed: tuple[sql.Indexed, ...], old: str, new: str, /
+) -> tuple[sql.Indexed, ...]:
+    return tuple(
+        dataclasses.replace(idx, column=new) if idx.column == old else idx
+        for idx in indexed
+    )
+
+
+def _rename_in_names(names: tuple[str, ...], old: str, new: str, /) -> tuple[str, ...]:
+    return tuple(new if name == old else name for name in names)
+
+
+def _rename_in_expr(
+    expr: tuple[tok.Token, ...], old: str, new: str, /
+) -> tuple[tok.Token, ...]:
+    return tuple(tok.Token(x.kind, new) if _is_name(x, old) else x for x in expr)
+
+
+def _map_foreign_keys(
+    table: sql.Table, f: Callable[[sql.ForeignKey], sql.ForeignKey], /
+) -> sql.Table:
+    """`table` where `f` is applied to every foreign key"""
+    return dataclasses.replace(
+        table,
+        columns=tuple(
+            dataclasses.replace(
+                col,
+                constraints=tuple(
+                    f(x) if isinstance(x, sql.ForeignKey) else x
+                    for x in col.constraints
+                ),
+            )
+            for col in table.columns
+        ),
+        constraints=tuple(
+            f(x) if isinstance(x, sql.ForeignKey) else x for x in table.constraints
+        ),
+    )
+
+
+def _refers_to(expr: Iterable[tok.Token], name: str, /) -> bool:
+    """Does `expr` contain the identifier `name`?"""
+    return any(_is_name(x, name) for x in expr)
+
+
+def _is_name(tk: tok.Token, name: str, /) -> bool:
+    # Identifiers are case insensitive
+    return bool(tk.mask & _NAME_MASK) and tk.val.lower() == name.lower()
+
+
+_NAME_MASK = tok.TokenKind.RAW_ID.value | tok.DELIMITED_ID_MASK
+
+
 def _generate_create_index(index: sql.Index, /) -> str:
     index_name = _generate_qualified_name(index.name)
     unique = " UNIQUE" if index.unique else ""
@@ -28,7 +381,7 @@ def _generate_create_index(index: sql.Index, /) -> str:
     where = f" WHERE {_generate_tokens(index.where)}" if index.where is not None else ""
     return textwrap.dedent(
         f"""
-        CREATE{unique} INDEX{if_not_exists} {index_name} ON "{index.table}"({idxs}){where};
+        CREATE{unique} INDEX{if_not_exists} {index_name} ON {_generate_name(index.table)}({idxs}){where};
         """
     )
 
@@ -60,16 +413,20 @@ def _generate_create_table(table: sql.Table, /) -> str:
 def _generate_column_def(col: sql.Column, /) -> str:
     coltype = " " + _generate_type(col.type) if col.type.name != "" else ""
     constraints = "".join(_generate_column_constraint(x) for x in col.constraints)
-    return f'"{col.name}"{coltype}{constraints}'
+    return f"{_generate_name(col.name)}{coltype}{constraints}"
 
 
 def _generate_column_constraint(constraint: sql.ColumnConstraint, /) -> str:
-    name = f' CONSTRAINT"{constraint.name}" ' if constraint.name is not None else ""
+    name = (
+        f" CONSTRAINT {_generate_name(constraint.name)}"
+        if constraint.name is not None
+        else ""
+    )
     if isinstance(constraint, sql.Uniqueness):
         on_conflict = _generate_on_conflict(constraint.on_conflict)
         if constraint.is_primary:
             sorting = constraint.indexed[0].sorting
-            sorting_str = f"{sorting.name}" if sorting is not None else ""
+            sorting_str = f" {sorting.name}" if sorting is not None else ""
             autoinc = " AUTOINCREMENT" if constraint.autoincrement else ""
             return f"{name} PRIMARY KEY{sorting_str}{on_conflict}{autoinc}"
         return f"{name} UNIQUE{on_conflict}"
@@ -84,6 +441,8 @@ def _generate_column_constraint(constraint: sql.ColumnConstraint, /) -> str:
         return f"{name} NOT NULL{on_conflict}"
     if isinstance(constraint, sql.Default):
         expr = _generate_tokens(constraint.expr)
+        if not _is_literal(constraint.expr):
+            expr = f"({expr})"
         return f"{name} DEFAULT {expr}"
     if isinstance(constraint, sql.Collation):
         return f"{name} COLLATE {constraint.value}"
@@ -93,7 +452,11 @@ def _generate_column_constraint(constraint: sql.ColumnConstraint, /) -> str:
 
 
 def _generate_table_constraint(constraint: sql.TableConstraint, /) -> str:
-    name = f'CONSTRAINT "{constraint.name}" ' if constraint.name is not None else ""
+    name = (
+        f"CONSTRAINT {_generate_name(constraint.name)} "
+        if constraint.name is not None
+        else ""
+    )
     if isinstance(constraint, sql.Uniqueness):
         idxs = ", ".join(_generate_indexed(idx) for idx in constraint.indexed)
         on_conflict = _generate_on_conflict(constraint.on_conflict)
@@ -101,7 +464,7 @@ def _generate_table_constraint(constraint: sql.TableConstraint, /) -> str:
             return f"{name}PRIMARY KEY ({idxs}){on_conflict}"
         return f"{name}UNIQUE ({idxs}){on_conflict}"
     if isinstance(constraint, sql.ForeignKey):
-        cols = ", ".join(f'"{col}"' for col in constraint.columns)
+        cols = ", ".join(map(_generate_name, constraint.columns))
         return f"{name}FOREIGN KEY ({cols}) " + _generate_foreign_key_clause(constraint)
     expr = _generate_tokens(constraint.expr)
     return f"{name}CHECK ({expr})"
@@ -110,7 +473,7 @@ def _generate_table_constraint(constraint: sql.TableConstraint, /) -> str:
 def _generate_foreign_key_clause(constraint: sql.ForeignKey, /) -> str:
     foreign_table = _generate_qualified_name(constraint.foreign_table)
     referred_columns = (
-        ("(" + ", ".join(f'"{col}"' for col in constraint.referred_columns) + ")")
+        ("(" + ", ".join(map(_generate_name, constraint.referred_columns)) + ")")
         if constraint.referred_columns is not None
         else ""
     )
@@ -143,10 +506,10 @@ def _generate_indexed(indexed: sql.Indexed, /) -> str:
     collation = ""
     sorting = ""
     if indexed.collation is not None:
-        collation = f" COLLATE {indexed.collation.name}"
+        collation = f" COLLATE {indexed.collation.value}"
     if indexed.sorting is not None:
         sorting = f" {indexed.sorting.name}"
-    return f'"{indexed.column}"{collation}{sorting}'
+    return f"{_generate_name(indexed.column)}{collation}{sorting}"
 
 
 def _generate_on_conflict(on_conflict: sql.OnConflict | None, /) -> str:
@@ -177,7 +540,11 @@ def _generate_type(ty: sql.Type | None, /) -> str:
 def _generate_qualified_name(qualified_name: sql.QualifiedName, /) -> str:
     names = list(qualified_name)
     names.reverse()
-    return ".".join(f'"{name}"' for name in names)
+    return ".".join(map(_generate_name, names))
+
+
+def _generate_name(name: str, /) -> str:
+    return '"' + name.replace('"', '""') + '"'
 
 
 def _generate_tokens(expr: Iterable[tok.Token], /) -> str:
@@ -185,18 +552,25 @@ def _generate_tokens(expr: Iterable[tok.Token], /) -> str:
 
 
 def _generate_tok(tk: tok.Token, /) -> str:
-    if bool(tk.kind & tok.TokenKind.DELIMITED_ID):
-        return f'"{tk.val}"'
-    if bool(tk.kind & tok.TokenKind.STR):
-        return f"'{tk.val}'"
-    if bool(tk.kind & tok.TokenKind.BLOB):
+    if tk.mask & tok.DELIMITED_ID_MASK:
+        return _generate_name(tk.val)
+    if tk.mask & tok.STR_MASK:
+        return "'" + tk.val.replace("'", "''") + "'"
+    if tk.mask & tok.BLOB_MASK:
         return f"X'{tk.val}'"
-    if bool(tk.kind & tok.TokenKind.BINARY):
+    if tk.mask & tok.BINARY_MASK:
         return f"B'{tk.val}'"
-    if bool(tk.kind & tok.TokenKind.HEX):
+    if tk.mask & tok.HEX_MASK:
         return f"0x{tk.val}"
-    if bool(tk.kind & tok.TokenKind.NUMERIC):
+    if tk.mask & tok.NUMERIC_MASK:
         return f"{tk.val}"
-    if bool(tk.kind & tok.TokenKind.TRIVIA):
+    if tk.mask & tok.TRIVIA_MASK:
         return ""
     return tk.val
+
+
+def _is_literal(expr: tuple[tok.Token, ...], /) -> bool:
+    """Is `expr` a literal or a signed number?"""
+    if len(expr) == 2 and expr[0] in (tok.NUM_PLUS, tok.NUM_MINUS):
+        expr = expr[1:]
+    return len(expr) == 1 and bool(expr[0].mask & tok.LITERAL_MASK)
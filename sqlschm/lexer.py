@@ -5,8 +5,19 @@
 SQL lexer / tokenizer.
 """
 
+from array import array
 from dataclasses import dataclass
-from typing import Iterator, Iterable, Generic, TypeVar
+import mmap
+import re
+from typing import (
+    IO,
+    Callable,
+    Generator,
+    Iterator,
+    Iterable,
+    Generic,
+    TypeVar,
+)
 from sqlschm import tok
 
 T = TypeVar("T")
@@ -33,6 +44,107 @@ class ItemCursor(Generic[T]):
 
 
 def tokens(src: Iterable[str], /) -> Iterable[tok.Token]:
+    """Tokens of `src`.
+
+    A `str` is scanned with integer offsets;
+    any other iterable of characters is scanned one character at a time.
+    Both produce the same tokens.
+    """
+    if isinstance(src, str):
+        return _str_tokens(src, _token)
+    return _char_tokens(src)
+
+
+# Default number of characters read at once by `tokens_from_stream`
+CHUNK_SIZE: int = 1 << 16
+
+
+def tokens_from_stream(
+    fp: IO[str], /, *, chunk_size: int = CHUNK_SIZE
+) -> Iterator[tok.Token]:
+    """Tokens of the content of `fp`, read by chunks of `chunk_size` characters.
+
+    A token that spans several chunks is yielded once it is complete.
+    Only the current chunk and the pending token are kept in memory.
+    """
+    return _read_by_chunks(
+        fp, chunk_size, lambda buffer, final: _str_tokens(buffer, _token, final=final)
+    )
+
+
+def _read_by_chunks(
+    fp: IO[str],
+    chunk_size: int,
+    scan: Callable[[str, bool], Generator[T, None, int]],
+    /,
+) -> Iterator[T]:
+    """Items scanned by `scan` in the content of `fp`, read by chunks.
+
+    `scan(buffer, final)` returns the position where the scan stopped.
+    The unscanned text is prepended to the next chunk.
+    """
+    pending = ""
+    while True:
+        # Read at least as much as what is pending to keep a linear time
+        # when an item spans many chunks.
+        chunk = fp.read(max(chunk_size, len(pending)))
+        final = chunk == ""
+        buffer = pending + chunk
+        pos = yield from scan(buffer, final)
+        if final:
+            return
+        pending = buffer[pos:]
+
+
+def span_tokens(src: str, /, *, start: int = 0) -> Iterable[tok.Token | tok.SpanToken]:
+    """Tokens of `src` from `start` that reference their value in `src`.
+
+    Interned tokens such as keywords and punctuations are yielded as they are.
+    The value of the other tokens is only built when it is read.
+    """
+    return _str_tokens(src, tok.SpanToken, start=start)
+
+
+def statements(
+    src: str, /, *, start: int = 0, final: bool = True
+) -> Iterator[tuple[int, int]]:
+    """Spans of the statements of `src` from `start`. Statements are not tokenized.
+
+    A statement spans from the end of the previous statement to its semicolon.
+    If `final` is true, then the text that follows the last semicolon is a last statement.
+    Otherwise `src` is a prefix of the source and this text is not yielded.
+    """
+    end = len(src)
+    while start < end:
+        stmt_end = _statement_end(src, start)
+        if stmt_end == -1:
+            if final:
+                yield start, end
+            return
+        yield start, stmt_end
+        start = stmt_end
+
+
+def statements_from_stream(
+    fp: IO[str], /, *, chunk_size: int = CHUNK_SIZE
+) -> Iterator[tuple[str, int, int]]:
+    """Statements of the content of `fp`, read by chunks of `chunk_size` characters.
+
+    Every statement is yielded as a buffer and the span of the statement in the buffer.
+    """
+    return _read_by_chunks(fp, chunk_size, _buffer_statements)
+
+
+def _buffer_statements(
+    buffer: str, final: bool, /
+) -> Generator[tuple[str, int, int], None, int]:
+    pos = 0
+    for start, pos in statements(buffer, final=final):
+        yield buffer, start, pos
+    return pos
+
+
+def _char_tokens(src: Iterable[str], /) -> Iterator[tok.Token]:
     cursor = ItemCursor(src, None)
     while cursor.item is not None:
         assert len(cursor.item) == 1
@@ -228,3 +340,568 @@ def _int_literal(cs: ItemCursor[str | None], /) -> str:
 
 
 _HEX_DIGITS: frozenset[str] = frozenset(iter("0123456789ABCDEFabcdef"))
+
+
+# Offset-based scanner
+#
+# The following functions scan a `str` with integer positions.
+# Every token class is recognized with a compiled pattern or with `str.find`.
+# They mirror the character-based scanner above and produce the same tokens.
+
+_IDENTIFIER = re.compile(r"[\w$]*")
+_FRACTIONAL = re.compile(r"\d*([eE][+-]?\d*)?")
+_HEX = re.compile(r"[0-9A-Fa-f]*")
+_BIN = re.compile(r"[01]*")
+
+# Characters that form a token on their own, whatever the next character is
+_SINGLE_CHAR_TOKENS: dict[str, tok.Token] = {
+    val: token
+    for val, token in tok.INTERNED.items()
+    if len(val) == 1
+    and val not in "#-./"
+    and not any(len(other) == 2 and other[0] == val for other in tok.INTERNED)
+}
+
+# A scanned token is either a complete token
+# or a kind with the span of the value of the token.
+_Scanned = tuple[tok.Token | tok.TokenKind, int, int, int]
+
+# Build a token from its kind and from the span of its value
+_MakeToken = Callable[[tok.TokenKind, str, int, int], T]
+
+
+def _token(kind: tok.TokenKind, src: str, start: int, end: int, /) -> tok.Token:
+    return tok.Token(kind, tok.unescape(kind, src[start:end]))
+
+
+def _str_tokens(
+    src: str, make: _MakeToken[T], /, *, start: int = 0, final: bool = True
+) -> Generator[tok.Token | T, None, int]:
+    """Tokens of `src` from `start`.
+
+    If `final` is false, then `src` is a prefix of the source and
+    the last token of `src` may continue after `src`: it is not yielded.
+    Return the position that follows the last yielded token.
+    """
+    pos = start
+    end = len(src)
+    while pos < end:
+        # fast paths for the most frequent tokens
+        char = src[pos]
+        single = _SINGLE_CHAR_TOKENS.get(char)
+        if single is not None:
+            yield single
+            pos += 1
+            continue
+        if char.isidentifier():
+            match = _IDENTIFIER.match(src, pos)
+            assert match is not None
+            id_end = match.end()
+            if src[id_end : id_end + 1] not in ("'", '"') and (final or id_end < end):
+                interned = tok.INTERNED.get(match.group().upper())
+                if interned is not None:
+                    yield interned
+                else:
+                    yield make(tok.TokenKind.RAW_ID, src, pos, id_end)
+                pos = id_end
+                continue
+        scanned, val_start, val_end, next_pos = _scan(src, pos)
+        if not final and next_pos >= end:
+            # the token may continue after `src`
+            break
+        if isinstance(scanned, tok.Token):
+            yield scanned
+        else:
+            yield make(scanned, src, val_start, val_end)
+        pos = next_pos
+    return pos
+
+
+def _scan(src: str, pos: int, /) -> _Scanned:
+    """Scan the token that starts at `pos`.
+
+    Return the scanned token, the span of its value, and the position that follows the token.
+    """
+    char = src[pos]
+    if char.isspace():
+        return tok.INTERNED[char], pos, pos, pos + 1
+    if char.isdecimal() or (char == "." and src[pos + 1 : pos + 2].isdecimal()):
+        return _scan_numeric(src, pos)
+    if char.isidentifier():
+        end = _match_end(_IDENTIFIER, src, pos)
+        id_upper = src[pos:end].upper()
+        if src[end : end + 1] in ("'", '"'):
+            if id_upper == "B":
+                return _scan_digits(src, end, _BIN, tok.TokenKind.BINARY)
+            if id_upper == "X":
+                return _scan_digits(src, end, _HEX, tok.TokenKind.BLOB)
+        if id_upper in tok.INTERNED:
+            return tok.INTERNED[id_upper], pos, end, end
+        return tok.TokenKind.RAW_ID, pos, end, end
+    if char in "'\"":
+        return _scan_str(src, pos)
+    if char in "`[":
+        end = _match_end(_IDENTIFIER, src, pos + 1)
+        # the closing delimiter is consumed without being checked
+        return tok.TokenKind.NON_STD_DELIMITED_ID, pos + 1, end, min(end + 1, len(src))
+    if char in tok.INTERNED:
+        concat = src[pos : pos + 2]
+        if concat in ("--", "# "):
+            end = src.find("\n", pos + 2)
+            if end == -1:
+                end = len(src)
+                return tok.TokenKind.SINGLE_LINE_COMMENT, pos + 2, end, end
+            return tok.TokenKind.SINGLE_LINE_COMMENT, pos + 2, end, end + 1
+        if concat == "/*":
+            end = src.find("*/", pos + 2)
+            if end == -1:
+                return tok.Token(tok.TokenKind.UNKNOWN, src[pos:]), pos, pos, len(src)
+            return tok.TokenKind.MULTI_LINE_COMMENT, pos + 2, end, end + 2
+        if len(concat) == 2 and concat in tok.INTERNED:
+            return tok.INTERNED[concat], pos, pos, pos + 2
+        return tok.INTERNED[char], pos, pos, pos + 1
+    return tok.Token(tok.TokenKind.UNKNOWN, char), pos, pos, pos + 1
+
+
+def _match_end(pattern: re.Pattern[str], src: str, pos: int, /) -> int:
+    """End of the match of `pattern` at `pos`, `pattern` always matches"""
+    match = pattern.match(src, pos)
+    assert match is not None
+    return match.end()
+
+
+def _scan_numeric(src: str, pos: int, /) -> _Scanned:
+    match = _FRACTIONAL.match(src, pos)
+    assert match is not None
+    end = match.end()
+    if match.start(1) != -1:
+        return tok.TokenKind.FLOAT, pos, end, end
+    if src.startswith(".", end):
+        end = _match_end(_FRACTIONAL, src, end + 1)
+        return tok.TokenKind.FLOAT, pos, end, end
+    if end == pos + 1 and src[pos] == "0" and src[end : end + 1] in ("x", "X"):
+        hex_end = _match_end(_HEX, src, end + 1)
+        if hex_end == end + 1:
+            return (
+                tok.Token(tok.TokenKind.UNKNOWN, src[pos : end + 1]),
+                pos,
+                pos,
+                end + 1,
+            )
+        return tok.TokenKind.HEX, end + 1, hex_end, hex_end
+    return tok.TokenKind.INT, pos, end, end
+
+
+def _scan_digits(
+    src: str, pos: int, digits: re.Pattern[str], kind: tok.TokenKind, /
+) -> _Scanned:
+    """Scan a quoted sequence of `digits` such as x'ae5' or b'010' from the quote at `pos`"""
+    delim = src[pos]
+    end = _match_end(digits, src, pos + 1)
+    if not src.startswith(delim, end):
+        return tok.Token(tok.TokenKind.UNKNOWN, src[pos:end]), pos, pos, end
+    return kind, pos + 1, end, end + 1
+
+
+def _scan_str(src: str, pos: int, /) -> _Scanned:
+    delim = src[pos]  # " or '
+    end = pos + 1
+    while True:
+        end = src.find(delim, end)
+        if end == -1:
+            val = delim + src[pos + 1 :].replace(delim + delim, delim)
+            return tok.Token(tok.TokenKind.UNKNOWN, val), pos, pos, len(src)
+        if not src.startswith(delim, end + 1):
+            break
+        end += 2  # skip escaped delim
+    kind = tok.TokenKind.STD_STR if delim == "'" else tok.TokenKind.STD_DELIMITED_ID
+    return kind, pos + 1, end, end + 1
+
+
+# Token buffer
+#
+# A token buffer stores the non-trivia tokens of a `str` in arrays of integers.
+# A token is identified by a code: the index of an interned token in `_CODES`,
+# or the index of the kind of a token that is not interned.
+
+# Interned tokens, then token kinds
+_CODES: tuple[tok.Token | tok.TokenKind, ...] = tuple(
+    dict.fromkeys(tok.INTERNED.values())
+) + tuple(tok.TokenKind)
+_TOKEN_CODES: dict[int, int] = {
+    id(token): code for code, token in enumerate(_CODES) if isinstance(token, tok.Token)
+}
+_KIND_CODES: dict[tok.TokenKind, int] = {
+    kind: code for code, kind in enumerate(_CODES) if isinstance(kind, tok.TokenKind)
+}
+# Code of tokens that are neither interned nor described by a span of the source
+_EXTRA_CODE = len(_CODES)
+_RAW_ID_CODE = _KIND_CODES[tok.TokenKind.RAW_ID]
+_TRIVIA_CODES: frozenset[int] = frozenset(
+    code
+    for code, token in enumerate(_CODES)
+    if isinstance(token, tok.Token) and token.mask & tok.TRIVIA_MASK
+) | frozenset(
+    code
+    for kind, code in _KIND_CODES.items()
+    if kind & tok.TokenKind.TRIVIA and kind.name is not None
+)
+_SINGLE_CHAR_CODES: dict[str, int] = {
+    char: _TOKEN_CODES[id(token)] for char, token in _SINGLE_CHAR_TOKENS.items()
+}
+_KEYWORD_CODES: dict[str, int] = {
+    val: _TOKEN_CODES[id(token)] for val, token in tok.INTERNED.items()
+}
+
+
+@dataclass(frozen=True, slots=True)
+class TokenBuffer:
+    """Non-trivia tokens of `src`.
+
+    The token at index `i` has the code `codes[i]`.
+    Its value spans from `starts[i]` to `ends[i]` in `src`.
+    A token that is not a span of `src`, such as an unterminated string,
+    is stored in `extra` at the index `starts[i]`.
+    """
+
+    src: str
+    codes: "array[int]"
+    starts: "array[int]"
+    ends: "array[int]"
+    extra: tuple[tok.Token, ...]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, i: int, /) -> tok.Token | tok.SpanToken:
+        code = self.codes[i]
+        if code == _EXTRA_CODE:
+            return self.extra[self.starts[i]]
+        token = _CODES[code]
+        if isinstance(token, tok.Token):
+            return token
+        return tok.SpanToken(token, self.src, self.starts[i], self.ends[i])
+
+    def __iter__(self) -> Iterator[tok.Token | tok.SpanToken]:
+        return (self[i] for i in range(len(self.codes)))
+
+    def slice(self, start: int, stop: int, /) -> "TokenBuffer":
+        """Buffer of the tokens from index `start` to `stop`"""
+        return TokenBuffer(
+            self.src,
+            self.codes[start:stop],
+            self.starts[start:stop],
+            self.ends[start:stop],
+            self.extra,
+        )
+
+
+_MAX_UINT32 = (1 << 32) - 1
+
+
+def token_buffer(src: str, /) -> TokenBuffer:
+    """Buffer of the non-trivia tokens of `src`, filled in a single pass"""
+    codes = array("H")
+    # 4-byte offsets unless `src` is too large for them
+    offset_typecode = "I" if len(src) <= _MAX_UINT32 else "Q"
+    starts = array(offset_typecode)
+    ends = array(offset_typecode)
+    extra: list[tok.Token] = []
+    pos = 0
+    end = len(src)
+    while pos < end:
+        # fast paths for the most frequent tokens
+        char = src[pos]
+        code = _SINGLE_CHAR_CODES.get(char)
+        if code is not None:
+            if code not in _TRIVIA_CODES:
+                codes.append(code)
+                starts.append(pos)
+                ends.append(pos + 1)
+            pos += 1
+            continue
+        if char.isidentifier():
+            id_end = _match_end(_IDENTIFIER, src, pos)
+            if src[id_end : id_end + 1] not in ("'", '"'):
+                codes.append(_KEYWORD_CODES.get(src[pos:id_end].upper(), _RAW_ID_CODE))
+                starts.append(pos)
+                ends.append(id_end)
+                pos = id_end
+                continue
+        scanned, val_start, val_end, next_pos = _scan(src, pos)
+        if isinstance(scanned, tok.TokenKind):
+            code = _KIND_CODES[scanned]
+        elif id(scanned) in _TOKEN_CODES:
+            code = _TOKEN_CODES[id(scanned)]
+            val_start, val_end = pos, next_pos
+        else:
+            code = _EXTRA_CODE
+            val_start = val_end = len(extra)
+            extra.append(scanned)
+        if code not in _TRIVIA_CODES:
+            codes.append(code)
+            starts.append(val_start)
+            ends.append(val_end)
+        pos = next_pos
+    return TokenBuffer(src, codes, starts, ends, tuple(extra))
+
+
+@dataclass(slots=True)
+class BufferCursor:
+    """Cursor over a token buffer with one token of lookahead.
+
+    It has the same interface as `ItemCursor`, the current token is at `pos`.
+    """
+
+    buffer: TokenBuffer
+    default_item: tok.Token
+    pos: int
+    item: tok.Token | tok.SpanToken
+    next_item: tok.Token | tok.SpanToken
+
+    def __init__(self, buffer: TokenBuffer, default_item: tok.Token) -> None:
+        self.buffer = buffer
+        self.default_item = default_item
+        self.pos = -2
+        self.next_item = default_item
+        self.forth()
+        self.forth()
+
+    def forth(self) -> None:
+        self.pos += 1
+        self.item = self.next_item
+        next_pos = self.pos + 1
+        if next_pos < len(self.buffer.codes):
+            self.next_item = self.buffer[next_pos]
+        else:
+            self.next_item = self.default_item
+
+
+# Byte-level scanner
+#
+# The following functions scan UTF-8 encoded bytes such as a memory-mapped file.
+# Structural ASCII bytes are scanned directly.
+# Only the text of identifiers, numbers, literals and comments is decoded.
+# Identifiers and numbers are decoded in a small window that is scanned by `_scan`,
+# so that non-ASCII characters are handled as in decoded text.
+
+Bytes = bytes | bytearray | memoryview | mmap.mmap
+
+_QUOTE_BYTES: frozenset[int] = frozenset(b"'\"")
+_SINGLE_BYTE_TOKENS: dict[int, tok.Token] = {
+    ord(val): token for val, token in _SINGLE_CHAR_TOKENS.items()
+}
+# Bytes that may start a token of several bytes made of ASCII characters
+_PUNCTUATION_BYTES: frozenset[int] = frozenset(
+    ord(val)
+    for val in tok.INTERNED
+    if len(val) == 1 and val.isascii() and ord(val) not in _SINGLE_BYTE_TOKENS
+) - frozenset(b".")
+# Bytes that may continue an identifier or a number, including non-ASCII bytes
+_B_WORD = re.compile(rb"[\w$.+\-\x80-\xff]*")
+_B_IDENTIFIER = re.compile(rb"[\w$]*")
+_ASCII_IDENTIFIER_START: frozenset[int] = frozenset(
+    byte for byte in range(0x80) if chr(byte).isidentifier()
+)
+# ASCII bytes that end an identifier that is neither a blob nor a binary prefix
+_ASCII_IDENTIFIER_END: frozenset[int] = frozenset(
+    byte for byte in range(0x80) if not re.match(r"[\w$'\"]", chr(byte))
+)
+_B_HEX = re.compile(rb"[0-9A-Fa-f]*")
+_B_BIN = re.compile(rb"[01]*")
+_B_NEWLINE = re.compile(rb"\n")
+_B_COMMENT_END = re.compile(rb"\*/")
+_B_QUOTES: dict[int, re.Pattern[bytes]] = {
+    quote: re.compile(re.escape(bytes([quote]))) for quote in _QUOTE_BYTES
+}
+# Initial number of bytes of a decoded window
+_WINDOW_SIZE = 64
+
+
+def tokens_from_bytes(data: Bytes, /) -> Iterator[tok.Token]:
+    """Tokens of the UTF-8 encoded `data`, such as a memory-mapped file.
+
+    The tokens are the same as the tokens of the decoded `data`.
+    """
+    pos = 0
+    end = len(data)
+    while pos < end:
+        byte = data[pos]
+        single = _SINGLE_BYTE_TOKENS.get(byte)
+        if single is not None:
+            yield single
+            pos += 1
+            continue
+        if byte in _ASCII_IDENTIFIER_START:
+            # fast path for ASCII identifiers
+            match = _B_IDENTIFIER.match(data, pos)
+            assert match is not None
+            id_end = match.end()
+            if id_end == end or data[id_end] in _ASCII_IDENTIFIER_END:
+                ident = str(match.group(), "ascii")
+                interned = tok.INTERNED.get(ident.upper())
+                yield interned or tok.Token(tok.TokenKind.RAW_ID, ident)
+                pos = id_end
+                continue
+        if byte in _QUOTE_BYTES:
+            token, pos = _scan_bytes_str(data, pos)
+            yield token
+        elif byte in _PUNCTUATION_BYTES:
+            token, pos = _scan_bytes_punctuation(data, pos)
+            yield token
+        elif byte < 0x80 and chr(byte).isspace():
+            yield tok.INTERNED[chr(byte)]
+            pos += 1
+        elif byte in b"bBxX" and pos + 1 < end and data[pos + 1] in _QUOTE_BYTES:
+            digits = _B_BIN if byte in b"bB" else _B_HEX
+            kind = tok.TokenKind.BINARY if byte in b"bB" else tok.TokenKind.BLOB
+            token, pos = _scan_bytes_digits(data, pos + 1, digits, kind)
+            yield token
+        else:
+            token, pos = _scan_bytes_window(data, pos)
+            yield token
+
+
+def _scan_bytes_window(data: Bytes, pos: int, /) -> tuple[tok.Token, int]:
+    """Decode the bytes from `pos` up to the next ASCII punctuation or space,
+    and scan the first token of the decoded text.
+    """
+    end = len(data)
+    word_end = _bytes_match_end(_B_WORD, data, pos + 1)
+    size = _WINDOW_SIZE
+    while True:
+        window_end = min(word_end, pos + size)
+        while window_end < end and 0x80 <= data[window_end] < 0xC0:
+            window_end -= 1  # do not split a UTF-8 sequence
+        if word_end == window_end < end:
+            window_end += (
+                1  # the character that follows may be consumed or looked ahead
+            )
+        window = str(data[pos:window_end], "utf-8")
+        scanned, val_start, val_end, next_pos = _scan(window, 0)
+        if next_pos < len(window) or window_end >= word_end:
+            break
+        size *= 2  # the token may continue after the window
+    if not isinstance(scanned, tok.Token):
+        scanned = _token(scanned, window, val_start, val_end)
+    if not window.isascii():
+        next_pos = len(window[:next_pos].encode("utf-8"))
+    return scanned, pos + next_pos
+
+
+def _scan_bytes_punctuation(data: Bytes, pos: int, /) -> tuple[tok.Token, int]:
+    concat = str(data[pos : pos + 2], "latin-1")
+    if concat in ("--", "# "):
+        end = _search(_B_NEWLINE, data, pos + 2)
+        if end == -1:
+            text = str(data[pos + 2 :], "utf-8")
+            return tok.Token(tok.TokenKind.SINGLE_LINE_COMMENT, text), len(data)
+        text = str(data[pos + 2 : end], "utf-8")
+        return tok.Token(tok.TokenKind.SINGLE_LINE_COMMENT, text), end + 1
+    if concat == "/*":
+        end = _search(_B_COMMENT_END, data, pos + 2)
+        if end == -1:
+            text = str(data[pos:], "utf-8")
+            return tok.Token(tok.TokenKind.UNKNOWN, text), len(data)
+        text = str(data[pos + 2 : end], "utf-8")
+        return tok.Token(tok.TokenKind.MULTI_LINE_COMMENT, text), end + 2
+    if len(concat) == 2 and concat in tok.INTERNED:
+        return tok.INTERNED[concat], pos + 2
+    return tok.INTERNED[concat[0]], pos + 1
+
+
+def _scan_bytes_digits(
+    data: Bytes, pos: int, digits: re.Pattern[bytes], kind: tok.TokenKind, /
+) -> tuple[tok.Token, int]:
+    """Scan a quoted sequence of `digits` such as x'ae5' or b'010' from the quote at `pos`"""
+    delim = data[pos]
+    end = _bytes_match_end(digits, data, pos + 1)
+    val = str(data[pos + 1 : end], "ascii")
+    if end < len(data) and data[end] == delim:
+        return tok.Token(kind, val), end + 1
+    return tok.Token(tok.TokenKind.UNKNOWN, chr(delim) + val), end
+
+
+def _scan_bytes_str(data: Bytes, pos: int, /) -> tuple[tok.Token, int]:
+    delim = data[pos]  # " or '
+    quote = _B_QUOTES[delim]
+    end = pos + 1
+    while True:
+        end = _search(quote, data, end)
+        if end == -1:
+            text = str(data[pos:], "utf-8")
+            val = text[0] + text[1:].replace(text[0] * 2, text[0])
+            return tok.Token(tok.TokenKind.UNKNOWN, val), len(data)
+        if end + 1 >= len(data) or data[end + 1] != delim:
+            break
+        end += 2  # skip escaped delim
+    kind = (
+        tok.TokenKind.STD_STR if delim == ord("'") else tok.TokenKind.STD_DELIMITED_ID
+    )
+    text = str(data[pos + 1 : end], "utf-8")
+    return tok.Token(kind, tok.unescape(kind, text)), end + 1
+
+
+def _bytes_match_end(pattern: re.Pattern[bytes], data: Bytes, pos: int, /) -> int:
+    """End of the match of `pattern` at `pos`, `pattern` always matches"""
+    match = pattern.match(data, pos)
+    assert match is not None
+    return match.end()
+
+
+def _search(pattern: re.Pattern[bytes], data: Bytes, pos: int, /) -> int:
+    """Position of the first match of `pattern` from `pos`, or -1"""
+    match = pattern.search(data, pos)
+    if match is None:
+        return -1
+    return match.start()
+
+
+# Statement splitter
+#
+# A statement ends with a semicolon that is outside strings,
+# delimited identifiers, and comments.
+# The body of a trigger contains statements, a trigger ends with `; END;`.
+
+_STATEMENT = re.compile(
+    r"(?:"
+    # run of plain characters that is matched atomically to avoid backtracking
+    r"(?=([^;'\"`\[/#-]+))\1"
+    r"|'[^']*'|\"[^\"]*\"|`[^`]*`|\[[^\]]*\]"
+    # The block comment is unrolled to end at its first `*/` even on backtracking.
+    # Thus, the end of a statement does not depend on the text that follows it.
+    r"|--[^\n]*\n|\#\ [^\n]*\n|/\*[^*]*\*+(?:[^/*][^*]*\*+)*/"
+    r"|-(?!-)|\#(?!\ )|/(?!\*)"
+    r")*;"
+)
+# spaces and comments between two words
+_GAP = r"(?:\s|--[^\n]*\n|/\*[\s\S]*?\*/)"
+_TRIGGER_START = re.compile(
+    rf"{_GAP}*CREATE{_GAP}+(?:TEMP{_GAP}+|TEMPORARY{_GAP}+)?TRIGGER\b", re.I
+)
+_TRIGGER_END = re.compile(rf";{_GAP}*END{_GAP}*;\Z", re.I)
+_LEADING_WORD = re.compile(rf"{_GAP}*([\w$]*)")
+
+
+def leading_word(src: str, start: int, /) -> str:
+    """Word that starts the statement at `start`, in uppercase. Spaces and comments are skipped."""
+    match = _LEADING_WORD.match(src, start)
+    assert match is not None
+    return match.group(1).upper()
+
+
+def _statement_end(src: str, start: int, /) -> int:
+    """End of the statement that starts at `start`, or -1 if it does not end in `src`"""
+    match = _STATEMENT.match(src, start)
+    if match is None:
+        return -1
+    end = match.end()
+    if _TRIGGER_START.match(src, start, end):
+        while True:
+            match = _STATEMENT.match(src, end)
+            if match is None:
+                return -1
+            if _TRIGGER_END.match(src, end - 1, match.end()):
+                return match.end()
+            end = match.end()
+    return end
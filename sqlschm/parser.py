@@ -7,10 +7,36 @@ Parser of SQL schema. Generate an AST.
 This is a handwritten recursive descent parser.
 """
 
-from typing import Iterable
+import bisect
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, as_completed
+import dataclasses
+import itertools
+import mmap
+import os
+import sys
+from typing import (
+    IO,
+    Any,
+    Callable,
+    ClassVar,
+    Collection,
+    Hashable,
+    Iterable,
+    Iterator,
+    Mapping,
+    Sequence,
+    TypeVar,
+)
 from sqlschm import sql, tok, lexer
 
-Lex = lexer.ItemCursor[tok.Token]
+Lex = lexer.ItemCursor[tok.Token | tok.SpanToken] | lexer.BufferCursor
+
+Key = TypeVar("Key", bound=Hashable)
+
+# Names of the selected tables, or a predicate on their qualified names
+Include = Collection[str] | Callable[[sql.QualifiedName], bool]
+_Selector = Callable[[sql.QualifiedName], bool]
 
 
 class ParserError(Exception):
@@ -20,41 +46,736 @@ class ParserError(Exception):
 # sentinel to mark the end of a token stream
 _EOF_TOKEN: tok.Token = tok.Token(tok.TokenKind.UNKNOWN, "")
 
+# Default maximum number of keys of a `StatementMemo`
+MEMO_SIZE: int = 1 << 12
+
+# Text of a statement without surrounding spaces, or its non-trivia tokens
+StatementKey = str | tuple[tok.Token, ...]
+
+
+@dataclasses.dataclass(slots=True)
+class StatementMemo:
+    """Parsed statements by their text or by their non-trivia tokens.
+
+    A memo can be shared by several parses: a statement that was already parsed
+    is not parsed again and the same item is returned.
+    Looking up a statement by its text avoids lexing it,
+    while its tokens match the same statement with other spaces or comments.
+    The least recently used keys are evicted beyond `max_size` keys.
+    """
+
+    max_size: int = MEMO_SIZE
+    _items: OrderedDict[StatementKey, sql.SchemaItem] = dataclasses.field(
+        default_factory=OrderedDict, init=False, repr=False
+    )
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: StatementKey, /) -> sql.SchemaItem | None:
+        item = self._items.get(key)
+        if item is not None:
+            self._items.move_to_end(key)
+        return item
+
+    def put(self, key: StatementKey, item: sql.SchemaItem, /) -> None:
+        self._items[key] = item
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+
+def parse_schema(
+    src: Iterable[str],
+    /,
+    *,
+    ddl_only: bool = False,
+    workers: int = 1,
+    lazy: bool = False,
+    include: Include | None = None,
+    memo: StatementMemo | None = None,
+) -> sql.Schema:
+    """Parse the schema `src`.
+
+    If `ddl_only` is true, then only CREATE TABLE and CREATE INDEX statements are parsed.
+    Other statements, such as the INSERT statements of a dump, are skipped
+    without being tokenized.
+
+    If `workers` is greater than 1, then `src` is split into batches of statements
+    that are parsed in a pool of `workers` processes.
+    Items are in source order and the raised error is the one of the first
+    invalid statement, as in a serial parse.
+
+    If `lazy` is true, then only the headers of the statements are parsed,
+    up to the name of the created table or index.
+    The rest of a statement is parsed on the first access to a field
+    that is not in its header, such as the columns of a table.
+    Errors in the rest of a statement are raised at this time.
+    Thus, an error in the header of a statement is raised before an error
+    in the rest of a previous statement.
+    `workers` is ignored in this mode.
+
+    If `include` is set, then only the selected tables and their indexes are parsed.
+    `include` is either a collection of table names or a predicate on
+    qualified table names. The qualified table name of an index is made of
+    its table name and of the qualifiers of its own name.
+    Other statements are skipped without building their items.
+    With several workers and a predicate, all statements are parsed
+    and the items are selected afterwards.
+
+    If `memo` is set, then the statements that are already in `memo` are not
+    parsed again, and the parsed statements are added to `memo`.
+    `memo` is not used by workers and in lazy mode.
+    """
+    if workers > 1 and not lazy:
+        text = src if isinstance(src, str) else "".join(src)
+        return sql.Schema(items=_parse_parallel(text, workers, ddl_only, include))
+    if lazy or ddl_only or include is not None or memo is not None:
+        text = src if isinstance(src, str) else "".join(src)
+        mode = _Mode(ddl_only, _selector(include), lazy, memo)
+        return sql.Schema(items=tuple(_parse_statements(text, mode)))
+    if isinstance(src, str):
+        # Lex all at once: the parser reads tokens from arrays
+        lex = lexer.BufferCursor(lexer.token_buffer(src), _EOF_TOKEN)
+        return sql.Schema(items=tuple(_iter_items(lex, None, None)))
+    return sql.Schema(items=tuple(iter_schema_items(src)))
+
+
+def iter_schema_items(
+    src: Iterable[str],
+    /,
+    *,
+    include: Include | None = None,
+    memo: StatementMemo | None = None,
+) -> Iterator[sql.SchemaItem]:
+    """Items of the schema `src`, yielded one by one as soon as they are parsed.
+
+    `src` is lexed lazily: an item is yielded before the next statements are lexed.
+    Only the items selected by `include` are parsed and `memo` is used
+    as in `parse_schema`.
+    """
+    if isinstance(src, str):
+        if include is not None or memo is not None:
+            return _parse_statements(src, _Mode(False, _selector(include), False, memo))
+        return _iter_items(_lex(src, 0), None, None)
+    return _iter_items(_lex_all(lexer.tokens(src)), _selector(include), memo)
+
+
+def parse_schema_file(
+    path: str | os.PathLike[str],
+    /,
+    *,
+    chunk_size: int = lexer.CHUNK_SIZE,
+    use_mmap: bool = False,
+    ddl_only: bool = False,
+    include: Include | None = None,
+    memo: StatementMemo | None = None,
+) -> sql.Schema:
+    """Parse the UTF-8 encoded schema stored at `path`.
+
+    The file is read by chunks of `chunk_size` characters.
+    If `use_mmap` is true, the file is memory-mapped and lexed as bytes instead.
+    If `ddl_only` is true, the file is read by chunks and
+    only CREATE TABLE and CREATE INDEX statements are parsed (see `parse_schema`).
+    Only the items selected by `include` are parsed and `memo` is used
+    as in `parse_schema`.
+    """
+    selected = _selector(include)
+    if ddl_only:
+        with open(path, encoding="utf-8") as fp:
+            mode = _Mode(True, selected, False, memo)
+            return sql.Schema(items=tuple(_parse_ddl_stream(fp, chunk_size, mode)))
+    if use_mmap:
+        with open(path, "rb") as fp:
+            if os.fstat(fp.fileno()).st_size == 0:
+                return sql.Schema(items=())
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                all_tokens = lexer.tokens_from_bytes(data)
+                items = _iter_items(_lex_all(all_tokens), selected, memo)
+                return sql.Schema(items=tuple(items))
+    with open(path, encoding="utf-8") as fp:
+        all_tokens = lexer.tokens_from_stream(fp, chunk_size=chunk_size)
+        return sql.Schema(
+            items=tuple(_iter_items(_lex_all(all_tokens), selected, memo))
+        )
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Statement:
+    """Statement that spans from `start` to `end` in the source of a document.
+
+    `item` is None if the statement is empty.
+    """
+
+    start: int
+    end: int
+    item: sql.SchemaItem | ParserError | None
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Document:
+    """Schema source and its parsed statements, that can be reparsed incrementally"""
+
+    src: str
+    statements: tuple[Statement, ...]
+
+    def schema(self, /) -> sql.Schema:
+        """Schema of the document. Raise the error of the first invalid statement."""
+        items: list[sql.SchemaItem] = []
+        for stmt in self.statements:
+            if isinstance(stmt.item, ParserError):
+                raise stmt.item
+            if stmt.item is not None:
+                items.append(stmt.item)
+        return sql.Schema(items=tuple(items))
+
+    def errors(self, /) -> Iterable[ParserError]:
+        return (x.item for x in self.statements if isinstance(x.item, ParserError))
+
+
+def parse_document(src: str, /) -> Document:
+    """Parse `src` statement by statement.
+
+    Errors are recorded in the statements instead of being raised.
+    """
+    return Document(
+        src=src,
+        statements=tuple(
+            _document_statement(src, *span) for span in lexer.statements(src)
+        ),
+    )
+
+
+def reparse(document: Document, start: int, end: int, replacement: str, /) -> Document:
+    """Parse `document` after the replacement of its text from `start` to `end`.
+
+    Only the statements that overlap the edit are parsed again.
+    Other statements and their items are reused.
+    """
+    old = document.statements
+    src = document.src[:start] + replacement + document.src[end:]
+    delta = len(replacement) - (end - start)
+    # A statement that ends at `start` can be continued by the replacement
+    first = bisect.bisect_left(old, start, key=lambda stmt: stmt.end)
+    rescan_start = old[first].start if first < len(old) else len(document.src)
+    # Statements that end in the unchanged text after the edit, by their new end
+    synced = {
+        old[i].end + delta: i for i in range(first, len(old)) if old[i].end >= end
+    }
+    statements = list(old[:first])
+    for span in lexer.statements(src, start=rescan_start):
+        statements.append(_document_statement(src, *span))
+        last = synced.get(span[1])
+        if last is not None:
+            # The remaining text is unchanged and is split in the same way
+            statements.extend(
+                Statement(start=x.start + delta, end=x.end + delta, item=x.item)
+                for x in old[last + 1 :]
+            )
+            break
+    return Document(src=src, statements=tuple(statements))
+
+
+def _document_statement(src: str, start: int, end: int, /) -> Statement:
+    item: sql.SchemaItem | ParserError | None
+    try:
+        item = _parse_statement(src, start, end, _DOCUMENT_MODE)
+    except ParserError as err:
+        item = err
+    return Statement(start=start, end=end, item=item)
 
-def parse_schema(src: Iterable[str], /) -> sql.Schema:
-    non_trivia_tokens = filter(tok.is_not_trivia, lexer.tokens(src))
-    lex = lexer.ItemCursor(non_trivia_tokens, _EOF_TOKEN)
-    tables: list[sql.SchemaItem] = []
+
+# Default number of characters (bytes for files) of a task of `parse_many`
+TASK_SIZE: int = 1 << 20
+
+# Errors of a source of `parse_many`
+SourceError = ParserError | OSError | UnicodeDecodeError
+
+
+def parse_many(
+    sources: Mapping[Key, str] | Iterable[Key],
+    /,
+    *,
+    executor: Executor | None = None,
+    chunksize: int = TASK_SIZE,
+    ordered: bool = True,
+) -> Iterator[tuple[Key, sql.Schema | SourceError]]:
+    """Parse many schemas in `executor`, a pool of processes by default.
+
+    `sources` is either a mapping from keys to schemas,
+    or an iterable of paths of UTF-8 encoded schemas that are also used as keys.
+    Consecutive sources are grouped in tasks of about `chunksize` characters
+    (bytes for files) to amortize the cost of inter-process communication.
+
+    Pairs of a key and its schema or its error are yielded in input order
+    if `ordered` is true, and in completion order otherwise.
+    The error of a source is either a parser error, or the error raised when
+    its file is read or decoded.
+    """
+    keys: list[Key] = []
+    inputs: list[tuple[bool, str]] = []
+    sizes: list[int] = []
+    if isinstance(sources, Mapping):
+        for key, src in sources.items():
+            keys.append(key)
+            inputs.append((False, src))
+            sizes.append(len(src))
+    else:
+        for path in sources:
+            if not isinstance(path, (str, os.PathLike)):
+                raise TypeError(f"'{path}' is not a path")
+            keys.append(path)
+            inputs.append((True, os.fspath(path)))
+            try:
+                sizes.append(os.path.getsize(path))
+            except OSError:
+                sizes.append(0)  # the error is reported by the task
+    own_executor = executor is None
+    pool = ProcessPoolExecutor() if executor is None else executor
+    try:
+        futures = [
+            pool.submit(_parse_task, list(enumerate(inputs[start:end], start)))
+            for start, end in _group_by_size(sizes, chunksize)
+        ]
+        completed: Iterable[Future[list[tuple[int, bytes | SourceError]]]]
+        completed = futures if ordered else as_completed(futures)
+        for future in completed:
+            for i, result in future.result():
+                if isinstance(result, bytes):
+                    yield keys[i], sql.loads(result)
+                else:
+                    yield keys[i], result
+    finally:
+        if own_executor:
+            pool.shutdown(cancel_futures=True)
+
+
+def _parse_task(
+    inputs: list[tuple[int, tuple[bool, str]]], /
+) -> list[tuple[int, bytes | SourceError]]:
+    """Serialized schemas or errors of `inputs`.
+
+    Schemas are serialized with `sql.dumps`, which is smaller and faster to load
+    than pickles.
+    """
+    result: list[tuple[int, bytes | SourceError]] = []
+    for i, (is_path, src) in inputs:
+        try:
+            if is_path:
+                result.append((i, sql.dumps(parse_schema_file(src))))
+            else:
+                result.append((i, sql.dumps(parse_schema(src))))
+        except (ParserError, OSError, UnicodeDecodeError) as err:
+            result.append((i, err))
+    return result
+
+
+def _group_by_size(sizes: Sequence[int], group_size: int, /) -> list[tuple[int, int]]:
+    """Split `sizes` in spans of consecutive elements of at least `group_size` in total.
+
+    The last span can be smaller.
+    """
+    result: list[tuple[int, int]] = []
+    group_start = 0
+    total = 0
+    for i, size in enumerate(sizes):
+        total += size
+        if total >= group_size:
+            result.append((group_start, i + 1))
+            group_start = i + 1
+            total = 0
+    if group_start < len(sizes):
+        result.append((group_start, len(sizes)))
+    return result
+
+
+# Number of batches per worker of `_parse_parallel`.
+# Several batches by worker balance the load between workers.
+_BATCHES_PER_WORKER = 4
+
+
+def _parse_parallel(
+    src: str, workers: int, ddl_only: bool, include: Include | None, /
+) -> tuple[sql.SchemaItem, ...]:
+    batches = _statement_batches(src, workers * _BATCHES_PER_WORKER)
+    if len(batches) <= 1:
+        return parse_schema(src, ddl_only=ddl_only, include=include).items
+    # A predicate may not be picklable: it is applied to the parsed items
+    batch_include = None if callable(include) else include
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [
+            executor.submit(_parse_batch, src[start:end], ddl_only, batch_include)
+            for start, end in batches
+        ]
+        # Results are collected in source order:
+        # the first raised error is the error of the first invalid statement.
+        items = itertools.chain.from_iterable(future.result() for future in futures)
+        if callable(include):
+            return tuple(item for item in items if include(_table_name(item)))
+        return tuple(items)
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def _parse_batch(
+    src: str, ddl_only: bool, include: Include | None, /
+) -> tuple[sql.SchemaItem, ...]:
+    return parse_schema(src, ddl_only=ddl_only, include=include).items
+
+
+def _statement_batches(src: str, count: int, /) -> list[tuple[int, int]]:
+    """Split `src` in at most `count` spans of consecutive statements of similar sizes"""
+    batch_size = len(src) // count + 1
+    result: list[tuple[int, int]] = []
+    batch_start = 0
+    for _, end in lexer.statements(src):
+        if end - batch_start >= batch_size:
+            result.append((batch_start, end))
+            batch_start = end
+    if batch_start < len(src):
+        result.append((batch_start, len(src)))
+    return result
+
+
+# Heads of the statements parsed by `_parse_create_statement`
+_CREATE_HEADS: tuple[tuple[tok.Token, ...], ...] = (
+    (tok.CREATE, tok.INDEX),
+    (tok.CREATE, tok.UNIQUE, tok.INDEX),
+) + tuple(
+    (tok.CREATE, *or_replace, *temp, tok.TABLE)
+    for or_replace in ((), (tok.OR, tok.REPLACE))
+    for temp in ((), (tok.TEMP,), (tok.TEMPORARY,))
+)
+_CREATE_HEAD_SIZE = max(len(head) for head in _CREATE_HEADS)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class _Mode:
+    """Options of `_parse_statement` (see `parse_schema`)"""
+
+    ddl_only: bool
+    selected: _Selector | None
+    lazy: bool
+    memo: StatementMemo | None
+
+
+# Mode of the statements of a `Document`
+_DOCUMENT_MODE = _Mode(False, None, False, None)
+
+
+def _parse_ddl_stream(
+    fp: IO[str], chunk_size: int, mode: _Mode, /
+) -> Iterator[sql.SchemaItem]:
+    for buffer, start, end in lexer.statements_from_stream(fp, chunk_size=chunk_size):
+        item = _parse_statement(buffer, start, end, mode)
+        if item is not None:
+            yield item
+
+
+def _parse_statements(src: str, mode: _Mode, /) -> Iterator[sql.SchemaItem]:
+    for start, end in lexer.statements(src):
+        item = _parse_statement(src, start, end, mode)
+        if item is not None:
+            yield item
+
+
+def _parse_statement(
+    src: str, start: int, end: int, mode: _Mode, /
+) -> sql.SchemaItem | None:
+    """Parse the statement that spans from `start` to `end`.
+
+    None is returned for an empty statement, a statement that is not selected,
+    and, in ddl_only mode, a statement that is neither a CREATE TABLE
+    nor a CREATE INDEX statement.
+    In lazy mode, only the head of the statement is parsed.
+    """
+    if mode.ddl_only and not _is_ddl_statement(src, start):
+        return None
+    memo = None if mode.lazy else mode.memo
+    text = ""
+    if memo is not None:
+        text = src[start:end].strip()
+        item = memo.get(text)
+        if item is not None:
+            if mode.selected is None or mode.selected(_table_name(item)):
+                return item
+            return None
+    l = _lex(src, start)
+    if l.item is tok.SEMICOLON or l.item is _EOF_TOKEN:
+        return None
+    if _is_create_index(l):
+        index_head = _parse_create_index_head(l)
+        if mode.selected is not None and not mode.selected(
+            _index_table_name(index_head)
+        ):
+            return None
+        if mode.lazy:
+            return _LazyIndex(src, start, index_head)
+        if memo is not None:
+            return _parse_memoized_text(src, start, text, memo)
+        return _parse_create_index_body(l, index_head)
+    table_head = _parse_create_table_head(l)
+    if mode.selected is not None and not mode.selected(table_head[0]):
+        return None
+    if mode.lazy:
+        return _LazyTable(src, start, table_head)
+    if memo is not None:
+        return _parse_memoized_text(src, start, text, memo)
+    return _parse_create_table_body(l, table_head)
+
+
+def _parse_memoized_text(
+    src: str, start: int, text: str, memo: StatementMemo, /
+) -> sql.SchemaItem:
+    """Parse the statement at `start` if its tokens are not in `memo`.
+
+    The item is memoized under `text` too.
+    """
+    item = _parse_memoized(_lex(src, start), None, memo)
+    assert item is not None
+    memo.put(text, item)
+    return item
+
+
+def _is_ddl_statement(src: str, start: int, /) -> bool:
+    """Is the statement at `start` a CREATE TABLE or a CREATE INDEX statement?"""
+    if lexer.leading_word(src, start) != "CREATE":
+        return False
+    non_trivia_tokens = filter(tok.is_not_trivia, lexer.span_tokens(src, start=start))
+    return _is_create_head(
+        tuple(itertools.islice(non_trivia_tokens, _CREATE_HEAD_SIZE))
+    )
+
+
+def _lex(src: str, start: int, /) -> Lex:
+    return _lex_all(lexer.span_tokens(src, start=start))
+
+
+def _lex_all(all_tokens: Iterable[tok.Token | tok.SpanToken], /) -> Lex:
+    return lexer.ItemCursor(filter(tok.is_not_trivia, all_tokens), _EOF_TOKEN)
+
+
+def _is_create_head(head: Sequence[tok.Token | tok.SpanToken], /) -> bool:
+    return any(
+        len(head) >= len(create_head) and all(a is b for a, b in zip(head, create_head))
+        for create_head in _CREATE_HEADS
+    )
+
+
+class _Lazy:
+    """Schema item that parses its statement on the first access to an unset field.
+
+    The statement starts at `_start` in `_src`.
+    Once parsed, the item `_item` is used for comparisons, hashing and
+    representation. Thus, a lazy item is equal to the item parsed eagerly.
+    `dataclasses.replace` builds an item of the eager class `_EAGER`.
+    """
+
+    __slots__ = ()
+    _EAGER: ClassVar[type[sql.SchemaItem]]
+    _src: str
+    _start: int
+    _item: sql.SchemaItem | None
+
+    def __new__(cls, *_: object, **fields: Any) -> Any:
+        if fields:
+            # Called with the fields of an item by `dataclasses.replace`
+            return cls._EAGER(**fields)
+        return super().__new__(cls)
+
+    def _parsed(self, /) -> sql.SchemaItem:
+        if self._item is None:
+            item = _parse_create_statement(_lex(self._src, self._start))
+            for field in dataclasses.fields(item):
+                object.__setattr__(self, field.name, getattr(item, field.name))
+            object.__setattr__(self, "_item", item)
+            return item
+        return self._item
+
+    def __getattr__(self, name: str) -> object:
+        # Only called when `name` is not set
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._parsed(), name)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, _Lazy):
+            other = other._parsed()
+        return self._parsed() == other
+
+    def __hash__(self) -> int:
+        return hash(self._parsed())
+
+    def __repr__(self) -> str:
+        return repr(self._parsed())
+
+    def __reduce__(self) -> tuple[object, ...]:
+        # Pickled and copied as the parsed item
+        return (dataclasses.replace, (self._parsed(),))
+
+
+class _LazyTable(_Lazy, sql.Table):
+    __slots__ = ("_src", "_start", "_item")
+    _EAGER = sql.Table
+
+    # pylint: disable-next=super-init-not-called
+    def __init__(
+        self,
+        src: str,
+        start: int,
+        head: tuple[sql.QualifiedName, bool, bool, bool],
+        /,
+    ) -> None:
+        name, if_not_exists, or_replace, temporary = head
+        object.__setattr__(self, "_src", src)
+        object.__setattr__(self, "_start", start)
+        object.__setattr__(self, "_item", None)
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "if_not_exists", if_not_exists)
+        object.__setattr__(self, "or_replace", or_replace)
+        object.__setattr__(self, "temporary", temporary)
+        object.__setattr__(self, "_columns_by_name", None)
+        object.__setattr__(self, "_parts", None)
+        object.__setattr__(self, "_fingerprint", None)
+
+
+class _LazyIndex(_Lazy, sql.Index):
+    __slots__ = ("_src", "_start", "_item")
+    _EAGER = sql.Index
+
+    # pylint: disable-next=super-init-not-called
+    def __init__(
+        self,
+        src: str,
+        start: int,
+        head: tuple[sql.QualifiedName, str, bool, bool],
+        /,
+    ) -> None:
+        name, table, if_not_exists, unique = head
+        object.__setattr__(self, "_src", src)
+        object.__setattr__(self, "_start", start)
+        object.__setattr__(self, "_item", None)
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "table", table)
+        object.__setattr__(self, "if_not_exists", if_not_exists)
+        object.__setattr__(self, "unique", unique)
+
+
+def _selector(include: Include | None, /) -> _Selector | None:
+    if include is None or callable(include):
+        return include
+    names = frozenset(include)
+    return lambda name: name[0] in names
+
+
+def _table_name(item: sql.SchemaItem, /) -> sql.QualifiedName:
+    """Qualified name of `item` if it is a table, of its table otherwise"""
+    if isinstance(item, sql.Index):
+        return (item.table,) + item.name[1:]
+    return item.name
+
+
+def _index_table_name(
+    index_head: tuple[sql.QualifiedName, str, bool, bool], /
+) -> sql.QualifiedName:
+    """Qualified name of the table of an index: the index and its table share a schema"""
+    index_name, table_name, _, _ = index_head
+    return (table_name,) + index_name[1:]
+
+
+def _iter_items(
+    lex: Lex, selected: _Selector | None, memo: StatementMemo | None, /
+) -> Iterator[sql.SchemaItem]:
     while lex.item is not _EOF_TOKEN:
         if lex.item is tok.SEMICOLON:
             lex.forth()
             continue
-        tables.append(_parse_create_statement(lex))
-    return sql.Schema(items=tuple(tables))
+        if memo is not None:
+            item = _parse_memoized(lex, selected, memo)
+        else:
+            item = _parse_selected_statement(lex, selected)
+        if item is not None:
+            yield item
+
+
+def _parse_memoized(
+    l: Lex, selected: _Selector | None, memo: StatementMemo, /
+) -> sql.Table | sql.Index | None:
+    """Parse the current statement if it is selected and not in `memo`"""
+    tokens = _statement_tokens(l)
+    item = memo.get(tokens)
+    if item is None:
+        item = _parse_selected_statement(lexer.ItemCursor(tokens, _EOF_TOKEN), selected)
+        if item is not None:
+            memo.put(tokens, item)
+        return item
+    if selected is None or selected(_table_name(item)):
+        return item
+    return None
+
+
+def _statement_tokens(l: Lex, /) -> tuple[tok.Token, ...]:
+    """Tokens of the current statement, including its semicolon"""
+    result: list[tok.Token] = []
+    while l.item is not tok.SEMICOLON and l.item is not _EOF_TOKEN:
+        result.append(_token(l.item))
+        l.forth()
+    if l.item is tok.SEMICOLON:
+        result.append(tok.SEMICOLON)
+        l.forth()
+    return tuple(result)
+
+
+def _parse_selected_statement(
+    l: Lex, selected: _Selector | None, /
+) -> sql.Table | sql.Index | None:
+    """Parse the current statement, or skip it if its table is not selected"""
+    if selected is None:
+        return _parse_create_statement(l)
+    if _is_create_index(l):
+        index_head = _parse_create_index_head(l)
+        if selected(_index_table_name(index_head)):
+            return _parse_create_index_body(l, index_head)
+    else:
+        table_head = _parse_create_table_head(l)
+        if selected(table_head[0]):
+            return _parse_create_table_body(l, table_head)
+    _skip_statement(l)
+    return None
+
+
+def _skip_statement(l: Lex, /) -> None:
+    """Skip the rest of the statement, up to its semicolon.
+
+    A semicolon is always at the top level of a CREATE TABLE or
+    a CREATE INDEX statement, so parentheses are not balanced.
+    """
+    while l.item is not tok.SEMICOLON and l.item is not _EOF_TOKEN:
+        l.forth()
+    _expect(l, tok.SEMICOLON)
 
 
 def _parse_create_statement(l: Lex, /) -> sql.Table | sql.Index:
-    if l.item is tok.CREATE and (l.next_item is tok.UNIQUE or l.next_item is tok.INDEX):
+    if _is_create_index(l):
         return _parse_create_index(l)
     return _parse_create_table(l)
 
 
+def _is_create_index(l: Lex, /) -> bool:
+    return l.item is tok.CREATE and (
+        l.next_item is tok.UNIQUE or l.next_item is tok.INDEX
+    )
+
+
 def _parse_create_index(l: Lex, /) -> sql.Index:
-    if_not_exists = False
-    unique = False
-    _expect(l, tok.CREATE)
-    if l.item is tok.UNIQUE:
-        l.forth()
-        unique = True
-    _expect(l, tok.INDEX)
-    if l.item is tok.IF:
-        l.forth()
-        _expect(l, tok.NOT)
-        _expect(l, tok.EXISTS)
-        if_not_exists = True
-    index_name = _parse_qualified_name(l)
-    _expect(l, tok.ON)
-    table_name = _parse_name(l)
+    return _parse_create_index_body(l, _parse_create_index_head(l))
+
+
+def _parse_create_index_body(
+    l: Lex, head: tuple[sql.QualifiedName, str, bool, bool], /
+) -> sql.Index:
+    index_name, table_name, if_not_exists, unique = head
     indexed = _parse_indexed_names(l)
     expr = None
     if l.item is tok.WHERE:
@@ -71,25 +792,34 @@ def _parse_create_index(l: Lex, /) -> sql.Index:
     )
 
 
-def _parse_create_table(l: Lex, /) -> sql.Table:
+def _parse_create_index_head(l: Lex, /) -> tuple[sql.QualifiedName, str, bool, bool]:
+    """Name, table, if_not_exists and unique of a CREATE INDEX statement"""
     if_not_exists = False
-    or_replace = False
-    temporary = False
+    unique = False
     _expect(l, tok.CREATE)
-    if l.item is tok.OR:
-        l.forth()
-        _expect(l, tok.REPLACE)
-        or_replace = True
-    if l.item is tok.TEMPORARY or l.item is tok.TEMP:
+    if l.item is tok.UNIQUE:
         l.forth()
-        temporary = True
-    _expect(l, tok.TABLE)
+        unique = True
+    _expect(l, tok.INDEX)
     if l.item is tok.IF:
         l.forth()
         _expect(l, tok.NOT)
         _expect(l, tok.EXISTS)
         if_not_exists = True
-    table_name = _parse_qualified_name(l)
+    index_name = _parse_qualified_name(l)
+    _expect(l, tok.ON)
+    table_name = _parse_name(l)
+    return index_name, table_name, if_not_exists, unique
+
+
+def _parse_create_table(l: Lex, /) -> sql.Table:
+    return _parse_create_table_body(l, _parse_create_table_head(l))
+
+
+def _parse_create_table_body(
+    l: Lex, head: tuple[sql.QualifiedName, bool, bool, bool], /
+) -> sql.Table:
+    table_name, if_not_exists, or_replace, temporary = head
     if l.item is tok.AS or l.item is tok.LIKE:
         # FIXME: support this case?
         raise ParserError(f"'CREATE TABLE {l.item.val}' is not supported.")
@@ -108,7 +838,7 @@ def _parse_create_table(l: Lex, /) -> sql.Table:
     options = _parse_table_options(l)
     if l.item is tok.SELECT:
         # consume SELECT expression
-        while l.item is not tok.SEMICOLON:
+        while l.item is not tok.SEMICOLON and l.item is not _EOF_TOKEN:
             l.forth()
     _expect(l, tok.SEMICOLON)
     return sql.Table(
@@ -122,6 +852,29 @@ def _parse_create_table(l: Lex, /) -> sql.Table:
     )
 
 
+def _parse_create_table_head(l: Lex, /) -> tuple[sql.QualifiedName, bool, bool, bool]:
+    """Name, if_not_exists, or_replace and temporary of a CREATE TABLE statement"""
+    if_not_exists = False
+    or_replace = False
+    temporary = False
+    _expect(l, tok.CREATE)
+    if l.item is tok.OR:
+        l.forth()
+        _expect(l, tok.REPLACE)
+        or_replace = True
+    if l.item is tok.TEMPORARY or l.item is tok.TEMP:
+        l.forth()
+        temporary = True
+    _expect(l, tok.TABLE)
+    if l.item is tok.IF:
+        l.forth()
+        _expect(l, tok.NOT)
+        _expect(l, tok.EXISTS)
+        if_not_exists = True
+    table_name = _parse_qualified_name(l)
+    return table_name, if_not_exists, or_replace, temporary
+
+
 def _parse_column_def(l: Lex, /) -> sql.Column:
     colname = _parse_name(l)
     coltype = _parse_type(l)
@@ -146,7 +899,7 @@ def _parse_table_options(l: Lex, /) -> sql.TableOptions:
             l.forth()
         else:
             break
-    return sql.TableOptions(strict=strict, without_rowid=without_rowid)
+    return sql.canonical(sql.TableOptions(strict=strict, without_rowid=without_rowid))
 
 
 def _parse_type(l: Lex, /) -> sql.Type:
@@ -154,10 +907,10 @@ def _parse_type(l: Lex, /) -> sql.Type:
     # TODO: while it is not a keyword, a comma, or a rparen -> it is the type!
     type_name = ""
     type_params: list[int] = []
-    while bool(l.item.kind & tok.TokenKind.NON_KW_ID):
+    while l.item.mask & tok.NON_KW_ID_MASK:
         type_name += l.item.val.upper() + " "
         l.forth()
-    type_name = type_name.rstrip()
+    type_name = sys.intern(type_name.rstrip())
     if type_name != "":
         if l.item is tok.L_PAREN:
             l.forth()
@@ -165,7 +918,7 @@ def _parse_type(l: Lex, /) -> sql.Type:
             if l.item is tok.COMMA:
                 type_params.append(_parse_int(l))
             _expect(l, tok.R_PAREN)
-    return sql.Type(name=type_name, params=tuple(type_params))
+    return sql.canonical(sql.Type(name=type_name, params=tuple(type_params)))
 
 
 def _parse_table_constraint(l: Lex, /) -> sql.TableConstraint:
@@ -208,7 +961,7 @@ def _parse_col_constraint(l: Lex, col_name: str, /) -> sql.ColumnConstraint:
         if is_primary:
             _expect(l, tok.KEY)
         sorting = _parse_optional_sorting(l)
-        indexed = (sql.Indexed(column=col_name, sorting=sorting),)
+        indexed = (sql.canonical(sql.Indexed(column=col_name, sorting=sorting)),)
         on_conflict = _parse_on_conflict(l)
         autoincrement = l.item is tok.AUTOINCREMENT or l.item is tok.AUTO_INCREMENT
         if autoincrement:
@@ -229,13 +982,13 @@ def _parse_col_constraint(l: Lex, col_name: str, /) -> sql.ColumnConstraint:
     if l.item is tok.NOT:
         l.forth()
         _expect(l, tok.NULL)
-        return sql.NotNull(name=name, on_conflict=_parse_on_conflict(l))
+        return sql.canonical(sql.NotNull(name=name, on_conflict=_parse_on_conflict(l)))
     if l.item is tok.DEFAULT:
         l.forth()
         return sql.Default(name=name, expr=_parse_expr(l))
     if l.item is tok.COLLATE:
         l.forth()
-        return sql.Collation(name=name, value=_parse_name(l))
+        return sql.canonical(sql.Collation(name=name, value=_parse_name(l)))
     if l.item is tok.GENERATED or l.item is tok.AS:
         if l.item is tok.GENERATED and l.next_item is tok.ALWAYS:
             l.forth()
@@ -250,7 +1003,7 @@ def _parse_col_constraint(l: Lex, col_name: str, /) -> sql.ColumnConstraint:
         expr = tokens_in_parens(l)
         kind = None
         tok_val = l.item.val.upper()
-        if bool(l.item.kind & tok.TokenKind.ID) and tok_val in sql.GENERATED_KIND:
+        if l.item.mask & tok.ID_MASK and tok_val in sql.GENERATED_KIND:
             kind = sql.GeneratedKind[tok_val]
             l.forth()
         return sql.Generated(name=name, expr=expr, kind=kind)
@@ -272,9 +1025,10 @@ def _parse_indexed_name(l: Lex, /) -> sql.Indexed:
     collation = None
     if l.item is tok.COLLATE:
         l.forth()
-        collation = sql.Collation(value=_parse_name(l))
+        collation = sql.canonical(sql.Collation(value=_parse_name(l)))
     sorting = _parse_optional_sorting(l)
-    return sql.Indexed(column=column, collation=collation, sorting=sorting)
+    indexed = sql.Indexed(column=column, collation=collation, sorting=sorting)
+    return sql.canonical(indexed)
 
 
 def _parse_optional_sorting(l: Lex, /) -> sql.Sorting | None:
@@ -289,16 +1043,16 @@ def _parse_optional_sorting(l: Lex, /) -> sql.Sorting | None:
 
 def _parse_expr(l: Lex, /) -> tuple[tok.Token, ...]:
     result: list[tok.Token] = []
-    if bool(l.item.kind & tok.TokenKind.LITERAL):
-        result.append(l.item)
+    if l.item.mask & tok.LITERAL_MASK:
+        result.append(_token(l.item))
         l.forth()
     elif l.item is tok.NUM_PLUS or l.item is tok.NUM_MINUS:
-        result += [l.item, l.next_item]
+        result += [_token(l.item), _token(l.next_item)]
         l.forth()
         _parse_int(l)  # ensure it is an integer
-    elif bool(l.item.kind & tok.TokenKind.ID) and l.next_item is tok.L_PAREN:
+    elif l.item.mask & tok.ID_MASK and l.next_item is tok.L_PAREN:
         # function call
-        result.append(l.item)
+        result.append(_token(l.item))
         l.forth()
         result.append(tok.L_PAREN)
         result += tokens_in_parens(l)
@@ -379,8 +1133,10 @@ def _parse_constraint_enforcement(l: Lex, /) -> sql.ConstraintEnforcement | None
         if initially is None:
             initially = _parse_constraint_enforcement_time(l)
     if not_deferrable is not None:
-        return sql.ConstraintEnforcement(
-            initially=initially, not_deferrable=not_deferrable
+        return sql.canonical(
+            sql.ConstraintEnforcement(
+                initially=initially, not_deferrable=not_deferrable
+            )
         )
     return None
 
@@ -452,7 +1208,7 @@ def _parse_qualified_name(l: Lex, /) -> sql.QualifiedName:
 
 
 def _parse_name(l: Lex, /) -> str:
-    if not bool(l.item.kind & tok.TokenKind.ID):
+    if not l.item.mask & tok.ID_MASK:
         raise ParserError("an identifier is expected.")
     result = l.item.val
     l.forth()
@@ -472,6 +1228,7 @@ def skip_parens(l: Lex, /) -> None:
     _expect(l, tok.L_PAREN)
     count = 0
     while l.item is not tok.R_PAREN or count > 0:
+        _expect_not_eof(l, tok.R_PAREN)
         if l.item is tok.L_PAREN:
             count += 1
         elif l.item is tok.R_PAREN:
@@ -485,7 +1242,8 @@ def tokens_in_parens(l: Lex, /) -> tuple[tok.Token, ...]:
     _expect(l, tok.L_PAREN)
     count = 0
     while l.item is not tok.R_PAREN or count > 0:
-        result.append(l.item)
+        _expect_not_eof(l, tok.R_PAREN)
+        result.append(_token(l.item))
         if l.item is tok.L_PAREN:
             count += 1
         elif l.item is tok.R_PAREN:
@@ -498,17 +1256,31 @@ def tokens_in_parens(l: Lex, /) -> tuple[tok.Token, ...]:
 def _tokens_until_semicolon(l: Lex, /) -> tuple[tok.Token, ...]:
     result: list[tok.Token] = []
     while l.item is not tok.SEMICOLON:
-        result.append(l.item)
+        _expect_not_eof(l, tok.SEMICOLON)
+        result.append(_token(l.item))
         l.forth()
     return tuple(result)
 
 
+def _token(tk: tok.Token | tok.SpanToken, /) -> tok.Token:
+    """Token that can be stored in the AST"""
+    if isinstance(tk, tok.SpanToken):
+        return tk.token()
+    return tk
+
+
 def _expect(l: Lex, tk: tok.Token, /) -> None:
     if l.item is not tk:
         raise ParserError(f"'{tk.val}' is expected. Got '{l.item.val}'.")
     l.forth()
 
 
+def _expect_not_eof(l: Lex, tk: tok.Token, /) -> None:
+    """Raise an error if the stream of tokens ended before `tk`"""
+    if l.item is _EOF_TOKEN:
+        _expect(l, tk)
+
+
 def _skip(l: Lex, kind: tok.TokenKind, /) -> None:
     if l.item.kind is kind:
         raise ParserError(f"a {kind.name} is expected")
@@ -5,10 +5,17 @@
 Representation of a SQL schema (AST).
 """
 
-from dataclasses import dataclass
+from array import array
+from dataclasses import dataclass, field, fields
 from enum import Enum, auto
+import hashlib
 import itertools
-from typing import Iterable
+import operator
+import struct
+import sys
+import types
+from typing import Any, Callable, Iterable, Mapping, TypeVar
+import weakref
 from sqlschm import tok
 
 
@@ -79,20 +86,63 @@ e.g. database.schema.table is represented as ("table", "schema", "database")
 QualifiedName = tuple[str, ...]
 
 
+class _Shareable:
+    """Base of the small value nodes that can be shared with `canonical`.
+
+    It enables weak references to its slotted subclasses.
+    """
+
+    __slots__ = ("__weakref__",)
+
+
+class _Fingerprinted:
+    """Base of the nodes that are hashed by their `fingerprint`.
+
+    The fingerprint is computed on the first hashing and cached.
+    Nodes whose fingerprints are computed are compared by fingerprint,
+    other nodes are compared field by field.
+    """
+
+    __slots__ = ()
+    _fingerprint: bytes | None
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__ or not isinstance(
+            other, _Fingerprinted
+        ):
+            return NotImplemented
+        if self is other:
+            return True
+        if self._fingerprint is not None and other._fingerprint is not None:
+            return self._fingerprint == other._fingerprint
+        compared_values = _COMPARED_VALUES[self.__class__]
+        return bool(compared_values(self) == compared_values(other))
+
+    def __hash__(self) -> int:
+        return hash(self._cached_fingerprint())
+
+    def _cached_fingerprint(self, /) -> bytes:
+        result = self._fingerprint
+        if result is None:
+            result = _fingerprint(self)
+            object.__setattr__(self, "_fingerprint", result)
+        return result
+
+
 @dataclass(frozen=True, kw_only=True, slots=True)
-class Type:
+class Type(_Shareable):
     name: str
     params: tuple[int, ...] = tuple()
 
 
 @dataclass(frozen=True, kw_only=True, slots=True)
-class ConstraintEnforcement:
+class ConstraintEnforcement(_Shareable):
     initially: ConstraintEnforcementTime | None = None
     not_deferrable: bool = False
 
 
 @dataclass(frozen=True, kw_only=True, slots=True)
-class Collation:
+class Collation(_Shareable):
     name: str | None = None
     value: str
 
@@ -104,7 +154,7 @@ class Default:
 
 
 @dataclass(frozen=True, kw_only=True, slots=True)
-class NotNull:
+class NotNull(_Shareable):
     name: str | None = None
     on_conflict: OnConflict | None = None
 
@@ -117,7 +167,7 @@ class Generated:
 
 
 @dataclass(frozen=True, kw_only=True, slots=True)
-class Indexed:
+class Indexed(_Shareable):
     column: str
     collation: Collation | None = None
     sorting: Sorting | None = None
@@ -183,42 +233,108 @@ def checks(constraints: Iterable[ColumnConstraint], /) -> Iterable[Check]:
     return (x for x in constraints if isinstance(x, Check))
 
 
-@dataclass(frozen=True, kw_only=True, slots=True)
-class Column:
+@dataclass(frozen=True, slots=True)
+class _ColumnParts:
+    """Constraints of a column by kind"""
+
+    collation: Collation | None
+    default: Default | None
+    generated: Generated | None
+    not_null: NotNull | None
+    table_constraints: tuple[TableConstraint, ...]
+
+
+def _column_parts(constraints: tuple[ColumnConstraint, ...], /) -> _ColumnParts:
+    return _ColumnParts(
+        collation=next((x for x in constraints if isinstance(x, Collation)), None),
+        default=next((x for x in constraints if isinstance(x, Default)), None),
+        generated=next((x for x in constraints if isinstance(x, Generated)), None),
+        not_null=next((x for x in constraints if isinstance(x, NotNull)), None),
+        table_constraints=tuple(
+            x
+            for x in constraints
+            if isinstance(x, Uniqueness)
+            or isinstance(x, ForeignKey)
+            or isinstance(x, Check)
+        ),
+    )
+
+
+@dataclass(frozen=True, kw_only=True, slots=True, eq=False)
+class Column(_Fingerprinted):
     name: str
     type: Type = Type(name="")
     constraints: tuple[ColumnConstraint, ...] = tuple()
+    # Built on the first comparison
+    _fingerprint: bytes | None = field(
+        init=False, repr=False, compare=False, default=None
+    )
+    # Built on the first query
+    _parts: _ColumnParts | None = field(
+        init=False, repr=False, compare=False, default=None
+    )
 
     def collation(self, /) -> Collation | None:
-        return next((x for x in self.constraints if isinstance(x, Collation)), None)
+        return self._partition().collation
 
     def default(self, /) -> Default | None:
-        return next((x for x in self.constraints if isinstance(x, Default)), None)
+        return self._partition().default
 
     def generated(self, /) -> Generated | None:
-        return next((x for x in self.constraints if isinstance(x, Generated)), None)
+        return self._partition().generated
 
     def not_null(self, /) -> NotNull | None:
-        return next((x for x in self.constraints if isinstance(x, NotNull)), None)
+        return self._partition().not_null
 
     def table_constraints(self, /) -> Iterable[TableConstraint]:
-        return (
-            x
-            for x in self.constraints
-            if isinstance(x, Uniqueness)
-            or isinstance(x, ForeignKey)
-            or isinstance(x, Check)
-        )
+        return self._partition().table_constraints
+
+    def _partition(self, /) -> _ColumnParts:
+        parts = self._parts
+        if parts is None:
+            parts = _column_parts(self.constraints)
+            object.__setattr__(self, "_parts", parts)
+        return parts
 
 
 @dataclass(frozen=True, kw_only=True, slots=True)
-class TableOptions:
+class TableOptions(_Shareable):
     strict: bool = False
     without_rowid: bool = False
 
 
-@dataclass(frozen=True, kw_only=True, slots=True)
-class Table:
+@dataclass(frozen=True, slots=True)
+class _TableParts:
+    """Constraints declared on a table and on its columns, by kind"""
+
+    all_constraints: tuple[TableConstraint, ...]
+    primary_key: Uniqueness | None
+    uniqueness: tuple[Uniqueness, ...]
+    foreign_keys: tuple[ForeignKey, ...]
+    checks: tuple[Check, ...]
+
+
+def _table_parts(
+    columns: tuple[Column, ...], constraints: tuple[TableConstraint, ...], /
+) -> _TableParts:
+    all_constraints = tuple(
+        itertools.chain(
+            itertools.chain.from_iterable(col.table_constraints() for col in columns),
+            constraints,
+        )
+    )
+    all_uniqueness = tuple(uniqueness(all_constraints))
+    return _TableParts(
+        all_constraints=all_constraints,
+        primary_key=primary_key(all_uniqueness),
+        uniqueness=all_uniqueness,
+        foreign_keys=tuple(foreign_keys(all_constraints)),
+        checks=tuple(checks(all_constraints)),
+    )
+
+
+@dataclass(frozen=True, kw_only=True, slots=True, eq=False)
+class Table(_Fingerprinted):
     name: QualifiedName
     columns: tuple[Column, ...]
     constraints: tuple[TableConstraint, ...] = tuple()
@@ -226,9 +342,28 @@ class Table:
     if_not_exists: bool = False
     or_replace: bool = False
     temporary: bool = False
+    # Built on the first comparison
+    _fingerprint: bytes | None = field(
+        init=False, repr=False, compare=False, default=None
+    )
+    # Built on the first lookup
+    _columns_by_name: dict[str, Column] | None = field(
+        init=False, repr=False, compare=False, default=None
+    )
+    # Built on the first query
+    _parts: _TableParts | None = field(
+        init=False, repr=False, compare=False, default=None
+    )
 
     def column(self, name: str, /) -> Column | None:
-        return next(x for x in self.columns if x.name == name)
+        """First column named `name`, or None if there is no such column"""
+        columns_by_name = self._columns_by_name
+        if columns_by_name is None:
+            columns_by_name = {}
+            for col in self.columns:
+                columns_by_name.setdefault(col.name, col)
+            object.__setattr__(self, "_columns_by_name", columns_by_name)
+        return columns_by_name.get(name)
 
     def generated_columns(self, /) -> Iterable[Column]:
         return (x for x in self.columns if x.generated() is not None)
@@ -238,28 +373,30 @@ class Table:
 
     def all_constraints(self, /) -> Iterable[TableConstraint]:
         """Constraints declared on the table and on the columns"""
-        return itertools.chain(
-            itertools.chain.from_iterable(
-                col.table_constraints() for col in self.columns
-            ),
-            self.constraints,
-        )
+        return self._partition().all_constraints
 
     def primary_key(self, /) -> Uniqueness | None:
         """First found primary key constraint"""
-        return primary_key(self.all_constraints())
+        return self._partition().primary_key
 
     def uniqueness(self, /) -> Iterable[Uniqueness]:
         """All uniqueness constraints, including the primary key"""
-        return uniqueness(self.all_constraints())
+        return self._partition().uniqueness
 
     def foreign_keys(self, /) -> Iterable[ForeignKey]:
         """All foreign key constraints"""
-        return foreign_keys(self.all_constraints())
+        return self._partition().foreign_keys
 
     def checks(self, /) -> Iterable[Check]:
         """All foreign key constraints"""
-        return checks(self.all_constraints())
+        return self._partition().checks
+
+    def _partition(self, /) -> _TableParts:
+        parts = self._parts
+        if parts is None:
+            parts = _table_parts(self.columns, self.constraints)
+            object.__setattr__(self, "_parts", parts)
+        return parts
 
 
 @dataclass(frozen=True, kw_only=True, slots=True)
@@ -275,26 +412,160 @@ class Index:
 SchemaItem = Index | Table
 
 
-@dataclass(frozen=True, kw_only=True, slots=True)
-class Schema:
+@dataclass(frozen=True, kw_only=True, slots=True, eq=False)
+class Schema(_Fingerprinted):
     items: tuple[SchemaItem, ...]
+    # Built on the first comparison
+    _fingerprint: bytes | None = field(
+        init=False, repr=False, compare=False, default=None
+    )
+    # Built on the first lookup
+    _tables_by_name: dict[str, Table] | None = field(
+        init=False, repr=False, compare=False, default=None
+    )
+    _indexes_by_table: dict[str, tuple[Index, ...]] | None = field(
+        init=False, repr=False, compare=False, default=None
+    )
 
     def tables(self, /) -> Iterable[Table]:
         return (x for x in self.items if isinstance(x, Table))
 
+    def table(self, name: str, /) -> Table | None:
+        """Last table named `name`, or None if there is no such table"""
+        return self._table_index().get(name)
+
     def indexes(self, /) -> Iterable[Index]:
         return (x for x in self.items if isinstance(x, Index))
 
+    def indexes_for(self, table: str, /) -> tuple[Index, ...]:
+        """Indexes of the table named `table`"""
+        indexes_by_table = self._indexes_by_table
+        if indexes_by_table is None:
+            lists: dict[str, list[Index]] = {}
+            for index in self.indexes():
+                lists.setdefault(index.table, []).append(index)
+            indexes_by_table = {name: tuple(x) for name, x in lists.items()}
+            object.__setattr__(self, "_indexes_by_table", indexes_by_table)
+        return indexes_by_table.get(table, ())
+
     def unique_indexes(self, /) -> Iterable[Index]:
         return (x for x in self.indexes() if x.unique)
 
+    def _table_index(self, /) -> dict[str, Table]:
+        tables_by_name = self._tables_by_name
+        if tables_by_name is None:
+            tables_by_name = {tbl.name[0]: tbl for tbl in self.tables()}
+            object.__setattr__(self, "_tables_by_name", tables_by_name)
+        return tables_by_name
+
+
+Node = (
+    Schema
+    | SchemaItem
+    | Column
+    | ColumnConstraint
+    | Type
+    | TableOptions
+    | Indexed
+    | ConstraintEnforcement
+)
+
+
+def fingerprint(node: Node, /) -> bytes:
+    """Stable structural digest of `node`.
+
+    Equal nodes have the same fingerprint, also across processes.
+    Fingerprints of schemas, tables and columns are computed bottom-up
+    and cached in the nodes.
+    """
+    if isinstance(node, _Fingerprinted):
+        return node._cached_fingerprint()  # pylint: disable=protected-access
+    return _digest(repr(node))
+
+
+def _fingerprint(node: _Fingerprinted, /) -> bytes:
+    if isinstance(node, Schema):
+        return _digest("Schema", *(fingerprint(item) for item in node.items))
+    if isinstance(node, Table):
+        header = (
+            node.name,
+            node.constraints,
+            node.options,
+            node.if_not_exists,
+            node.or_replace,
+            node.temporary,
+        )
+        columns = (fingerprint(col) for col in node.columns)
+        return _digest("Table", repr(header), *columns)
+    return _digest(repr(node))
+
+
+# Values of the fields that are compared, by class
+_COMPARED_VALUES: dict[type, Callable[[Any], Any]] = {
+    cls: operator.attrgetter(*(f.name for f in fields(cls) if f.compare))
+    for cls in (Schema, Table, Column)
+}
+
+
+def _digest(*parts: str | bytes) -> bytes:
+    result = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        data = part.encode("utf-8") if isinstance(part, str) else part
+        # Prefix with the length to keep parts apart
+        result.update(len(data).to_bytes(4, "little"))
+        result.update(data)
+    return result.digest()
+
+
+ShareableNode = TypeVar(
+    "ShareableNode",
+    Type,
+    ConstraintEnforcement,
+    Collation,
+    NotNull,
+    Indexed,
+    TableOptions,
+)
+
+# Canonical instances by type and field values.
+# An entry is removed once its instance is no longer referenced.
+_CANONICAL: weakref.WeakValueDictionary[
+    tuple[type, Any], _Shareable
+] = weakref.WeakValueDictionary()
+
+_FIELD_VALUES: dict[type, Callable[[Any], Any]] = {
+    cls: operator.attrgetter(*(f.name for f in fields(cls)))
+    for cls in (Type, ConstraintEnforcement, Collation, NotNull, Indexed, TableOptions)
+}
+
+
+def canonical(node: ShareableNode, /) -> ShareableNode:
+    """Instance equal to `node` that is shared by all callers.
+
+    Equal nodes share the same instance as long as it is referenced.
+    This saves memory and makes comparisons of equal nodes short-circuit
+    on identity.
+    """
+    cls = type(node)
+    key = (cls, _FIELD_VALUES[cls](node))
+    result = _CANONICAL.get(key)
+    if result is None:
+        _CANONICAL[key] = node
+        return node
+    assert isinstance(result, cls)
+    return result
+
 
-Symbols = dict[str, Table]
+Symbols = Mapping[str, Table]
 
 
 def symbols(schema: Schema, /) -> Symbols:
-    """Symbol table from `schema`."""
-    return {tbl.name[0]: tbl for tbl in schema.tables()}
+    """Symbol table from `schema`.
+
+    The symbol table is a read-only view of the cached name index of `schema`.
+    """
+    # pylint: disable-next=protected-access
+    return types.MappingProxyType(schema._table_index())
 
 
 def referred_columns(fk: ForeignKey, syms: Symbols, /) -> tuple[str, ...]:
@@ -328,3 +599,752 @@ def resolve_foreign_key(
             yield from resolve_foreign_key(f_fk, f_col, syms)
             return
     yield f_col
+
+
+class ForeignKeyGraph:
+    """Graph of the foreign keys between the tables of a schema.
+
+    Tables are identified by their unqualified name, as in `symbols`.
+    The graph is built once in linear time.
+    Foreign keys to tables that are not in the schema are edges to nowhere:
+    they are ignored by `cycles` and `topological_order`.
+    """
+
+    __slots__ = (
+        "_tables",
+        "_references",
+        "_referrers",
+        "_successors",
+        "_column_refs",
+        "_targets",
+    )
+    _tables: Symbols
+    _references: dict[str, tuple[ForeignKey, ...]]
+    _referrers: dict[str, list[tuple[str, ForeignKey]]]
+    # Names of the tables of the schema that a table refers to
+    _successors: dict[str, tuple[str, ...]]
+    # First foreign key of a column, by table and column name
+    _column_refs: dict[tuple[str, str], ForeignKey]
+    # Resolved columns, by table and column name
+    _targets: dict[tuple[str, str], tuple[str, str]]
+
+    def __init__(self, schema: Schema, /) -> None:
+        self._tables = symbols(schema)
+        self._references = {}
+        self._referrers = {}
+        self._successors = {}
+        self._column_refs = {}
+        self._targets = {}
+        for name, table in self._tables.items():
+            fks = tuple(table.foreign_keys())
+            self._references[name] = fks
+            for fk in fks:
+                referrers = self._referrers.setdefault(fk.foreign_table[0], [])
+                referrers.append((name, fk))
+                for col in fk.columns:
+                    self._column_refs.setdefault((name, col), fk)
+        for name, fks in self._references.items():
+            self._successors[name] = tuple(
+                dict.fromkeys(
+                    fk.foreign_table[0]
+                    for fk in fks
+                    if fk.foreign_table[0] in self._tables
+                )
+            )
+
+    def references(self, table: str, /) -> tuple[ForeignKey, ...]:
+        """Foreign keys of `table`"""
+        return self._references.get(table, ())
+
+    def referrers(self, table: str, /) -> tuple[tuple[str, ForeignKey], ...]:
+        """Foreign keys that refer to `table`, with the name of their table"""
+        return tuple(self._referrers.get(table, ()))
+
+    def resolve(self, table: str, column: str, /) -> tuple[str, str]:
+        """Table and column that `column` of `table` ultimately refers to.
+
+        References are followed through chains of foreign keys,
+        as in `resolve_foreign_key`. A column that is not part of a foreign key
+        resolves to itself. Results are memoized.
+        Raise ValueError if references are cyclic or cannot be resolved.
+        """
+        key = (table, column)
+        path: dict[tuple[str, str], None] = {}
+        while (target := self._targets.get(key)) is None:
+            fk = self._column_refs.get(key)
+            if fk is None:
+                target = key
+                break
+            if key in path:
+                raise ValueError(f"Column '{key[1]}' of '{key[0]}' refers to itself")
+            path[key] = None
+            key = (fk.foreign_table[0], self._referred_column(fk, key[1]))
+        path[key] = None
+        for visited in path:
+            self._targets[visited] = target
+        return target
+
+    def cycles(self, /) -> tuple[tuple[str, ...], ...]:
+        """Groups of tables that refer to each other, directly or not.
+
+        A table that refers to itself is a group of one table.
+        """
+        # Tarjan's algorithm, without recursion
+        index: dict[str, int] = {}
+        low: dict[str, int] = {}
+        stack: list[str] = []
+        on_stack: set[str] = set()
+        result: list[tuple[str, ...]] = []
+        for root in self._tables:
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self._successors[root]))]
+            while work:
+                node, successors = work[-1]
+                for succ in successors:
+                    if succ not in index:
+                        index[succ] = low[succ] = len(index)
+                        stack.append(succ)
+                        on_stack.add(succ)
+                        work.append((succ, iter(self._successors[succ])))
+                        break
+                    if succ in on_stack:
+                        low[node] = min(low[node], index[succ])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        group: list[str] = []
+                        while not group or group[-1] != node:
+                            group.append(stack.pop())
+                            on_stack.discard(group[-1])
+                        if len(group) > 1 or node in self._successors[node]:
+                            result.append(tuple(reversed(group)))
+        return tuple(result)
+
+    def topological_order(self, /) -> tuple[Table, ...]:
+        """Tables of the schema, each table after the tables it refers to.
+
+        References of a table to itself are ignored.
+        Tables that are not ordered by their references keep their schema order.
+        Raise ValueError if tables refer to each other in a cycle.
+        """
+        order: list[str] = []
+        # False while the references of a table are visited, then True
+        done: dict[str, bool] = {}
+        for root in self._tables:
+            if root in done:
+                continue
+            done[root] = False
+            work = [(root, iter(self._successors[root]))]
+            while work:
+                node, successors = work[-1]
+                for succ in successors:
+                    if succ not in done:
+                        done[succ] = False
+                        work.append((succ, iter(self._successors[succ])))
+                        break
+                    if not done[succ] and succ != node:
+                        raise ValueError(f"Table '{succ}' is in a cycle of references")
+                else:
+                    work.pop()
+                    done[node] = True
+                    order.append(node)
+        return tuple(self._tables[name] for name in order)
+
+    def _referred_column(self, fk: ForeignKey, column: str, /) -> str:
+        ref_cols = fk.referred_columns
+        if ref_cols is None:
+            foreign_table = self._tables.get(fk.foreign_table[0])
+            f_pk = foreign_table.primary_key() if foreign_table is not None else None
+            if f_pk is None:
+                raise ValueError(
+                    f"Table '{fk.foreign_table[0]}' has no primary key to refer to"
+                )
+            ref_cols = tuple(f_pk.columns())
+        if len(ref_cols) != len(fk.columns):
+            raise ValueError(
+                f"Foreign key to '{fk.foreign_table[0]}' has mismatched columns"
+            )
+        return ref_cols[fk.columns.index(column)]
+
+
+@dataclass(frozen=True, kw_only=True, slots=True)
+class TableDiff:
+    """Changes of a table that is in both diffed schemas"""
+
+    old: Table
+    new: Table
+    added_columns: tuple[Column, ...] = tuple()
+    dropped_columns: tuple[Column, ...] = tuple()
+    # Pairs of the old and the new column
+    modified_columns: tuple[tuple[Column, Column], ...] = tuple()
+    added_constraints: tuple[TableConstraint, ...] = tuple()
+    dropped_constraints: tuple[TableConstraint, ...] = tuple()
+
+
+@dataclass(frozen=True, kw_only=True, slots=True)
+class SchemaDiff:
+    added_tables: tuple[Table, ...] = tuple()
+    dropped_tables: tuple[Table, ...] = tuple()
+    modified_tables: tuple[TableDiff, ...] = tuple()
+    added_indexes: tuple[Index, ...] = tuple()
+    dropped_indexes: tuple[Index, ...] = tuple()
+    # Pairs of the old and the new index
+    modified_indexes: tuple[tuple[Index, Index], ...] = tuple()
+
+    def is_empty(self, /) -> bool:
+        """Are the diffed schemas equal, apart from the order of their items?"""
+        return self == SchemaDiff()
+
+
+def diff(old: Schema, new: Schema, /) -> SchemaDiff:
+    """Changes from `old` to `new`.
+
+    Tables and indexes are matched by unqualified name, columns by name.
+    Constraints declared on a table are matched by value;
+    a change of a column constraint is a change of its column.
+    The fingerprints of all tables are computed (see `fingerprint`):
+    equal tables are then skipped without being walked.
+    """
+    old_tables = tuple(old.tables())
+    new_tables = tuple(new.tables())
+    for table in itertools.chain(old_tables, new_tables):
+        fingerprint(table)
+    added_tables, dropped_tables, table_pairs = _match(
+        old_tables, new_tables, _item_name
+    )
+    added_indexes, dropped_indexes, modified_indexes = _match(
+        tuple(old.indexes()), tuple(new.indexes()), _item_name
+    )
+    return SchemaDiff(
+        added_tables=added_tables,
+        dropped_tables=dropped_tables,
+        modified_tables=tuple(_diff_table(*pair) for pair in table_pairs),
+        added_indexes=added_indexes,
+        dropped_indexes=dropped_indexes,
+        modified_indexes=modified_indexes,
+    )
+
+
+def _diff_table(old: Table, new: Table, /) -> TableDiff:
+    added_columns, dropped_columns, modified_columns = _match(
+        old.columns, new.columns, _column_name
+    )
+    old_constraints = frozenset(old.constraints)
+    new_constraints = frozenset(new.constraints)
+    return TableDiff(
+        old=old,
+        new=new,
+        added_columns=added_columns,
+        dropped_columns=dropped_columns,
+        modified_columns=modified_columns,
+        added_constraints=tuple(x for x in new.constraints if x not in old_constraints),
+        dropped_constraints=tuple(
+            x for x in old.constraints if x not in new_constraints
+        ),
+    )
+
+
+_Named = TypeVar("_Named", Table, Index, Column)
+
+
+def _match(
+    old: tuple[_Named, ...], new: tuple[_Named, ...], name: Callable[[_Named], str], /
+) -> tuple[tuple[_Named, ...], tuple[_Named, ...], tuple[tuple[_Named, _Named], ...]]:
+    """Added items, dropped items, and pairs of old and new modified items"""
+    old_by_name = {name(x): x for x in old}
+    new_names = {name(x) for x in new}
+    added: list[_Named] = []
+    modified: list[tuple[_Named, _Named]] = []
+    for item in new:
+        old_item = old_by_name.get(name(item))
+        if old_item is None:
+            added.append(item)
+        elif old_item != item:
+            modified.append((old_item, item))
+    dropped = tuple(x for key, x in old_by_name.items() if key not in new_names)
+    return tuple(added), dropped, tuple(modified)
+
+
+def _item_name(item: Table | Index, /) -> str:
+    return item.name[0]
+
+
+def _column_name(col: Column, /) -> str:
+    return col.name
+
+
+# Binary serialization.
+#
+# A serialized schema is made of a header, an array of unsigned integers,
+# and the UTF-8 encoded concatenation of all its strings.
+# The integers are stored in the smallest of 1, 2, and 4 bytes that fits them.
+# The array starts with the length of every string, then with a table of
+# tokens (kind and string of each token), then with the schema itself.
+# Strings and tokens are referred to by their 1-based index in their table.
+# Optional values are encoded as 0 when they are absent;
+# enum members are encoded as their 1-based ordinal,
+# and token kinds as their 0-based ordinal in `_TOKEN_KINDS`.
+_FORMAT_MAGIC = b"sqlschm"
+# Bump on any change of the format, including of the members of the enums
+_FORMAT_VERSION = 2
+# Magic, version, array typecode, number of strings, tokens, and integers
+_HEADER = struct.Struct("<7sBcIII")
+_TYPECODES = (b"B", b"H", b"I")
+
+_ENUM_MEMBERS: dict[type[Enum], tuple[Any, ...]] = {
+    cls: (None, *cls)
+    for cls in (
+        ConstraintEnforcementTime,
+        Match,
+        OnConflict,
+        OnUpdateDelete,
+        Sorting,
+        GeneratedKind,
+    )
+}
+_ORDINALS: dict[Enum, int] = {
+    member: i
+    for members in _ENUM_MEMBERS.values()
+    for i, member in enumerate(members)
+    if member is not None
+}
+
+_TOKEN_KINDS: tuple[tok.TokenKind, ...] = tuple(
+    dict.fromkeys(tok.TokenKind.__members__.values())
+)
+_TOKEN_KIND_ORDINALS: dict[tok.TokenKind, int] = {
+    kind: i for i, kind in enumerate(_TOKEN_KINDS)
+}
+
+_CONSTRAINT_TYPES: tuple[type, ...] = (
+    Uniqueness,
+    ForeignKey,
+    Check,
+    Collation,
+    Default,
+    NotNull,
+    Generated,
+)
+_CONSTRAINT_TAGS: dict[type, int] = {
+    cls: tag for tag, cls in enumerate(_CONSTRAINT_TYPES)
+}
+
+
+def dumps(schema: Schema, /) -> bytes:
+    """Compact binary representation of `schema`.
+
+    Use `loads` to get the schema back.
+    The format is versioned: data written by another version of sqlschm
+    may be rejected by `loads`.
+    """
+    dumper = _Dumper()
+    dumper.schema(schema)
+    ints = array("I", itertools.chain(map(len, dumper.strings), dumper.token_ints))
+    ints += dumper.ints
+    max_int = max(ints, default=0)
+    typecode = next(
+        code for code in _TYPECODES if max_int < 1 << 8 * array(code.decode()).itemsize
+    )
+    ints = array(typecode.decode(), ints)
+    if sys.byteorder == "big":
+        ints.byteswap()
+    header = _HEADER.pack(
+        _FORMAT_MAGIC,
+        _FORMAT_VERSION,
+        typecode,
+        len(dumper.strings),
+        len(dumper.token_ints) // 2,
+        len(ints),
+    )
+    return header + ints.tobytes() + "".join(dumper.strings).encode("utf-8")
+
+
+def loads(data: bytes, /) -> Schema:
+    """Schema serialized by `dumps`.
+
+    Raise ValueError if `data` is not a schema serialized by this version
+    of sqlschm.
+    """
+    try:
+        header = _HEADER.unpack_from(data)
+    except struct.error as e:
+        raise ValueError("Truncated serialized schema") from e
+    magic, version, typecode, string_count, token_count, int_count = header
+    if magic != _FORMAT_MAGIC:
+        raise ValueError("Not a serialized schema")
+    if version != _FORMAT_VERSION:
+        raise ValueError(f"Unsupported serialization format {version}")
+    if typecode not in _TYPECODES:
+        raise ValueError("Corrupted serialized schema")
+    ints = array(typecode.decode())
+    ints_end = _HEADER.size + int_count * ints.itemsize
+    ints.frombytes(data[_HEADER.size : ints_end])
+    if sys.byteorder == "big":
+        ints.byteswap()
+    try:
+        text = data[ints_end:].decode("utf-8")
+        # References are 1-based: the first element of each table is unused
+        strings = [""]
+        end = 0
+        for length in ints[:string_count]:
+            start, end = end, end + length
+            strings.append(sys.intern(text[start:end]))
+        body_start = string_count + 2 * token_count
+        if len(ints) != int_count or body_start > int_count or end != len(text):
+            raise ValueError("Truncated serialized schema")
+        token_ints = ints[string_count:body_start]
+        tokens = [tok.NULL]
+        for kind, val in zip(token_ints[::2], token_ints[1::2]):
+            tokens.append(_load_token(_TOKEN_KINDS[kind], strings[val]))
+        loader = _Loader(ints[body_start:], strings, tokens)
+        schema = loader.schema()
+        if not loader.at_end():
+            raise ValueError("Trailing data in serialized schema")
+        return schema
+    # Missing integers raise StopIteration, or RuntimeError when the
+    # StopIteration is raised in a generator expression of `_Loader`.
+    except (IndexError, RuntimeError, StopIteration, UnicodeDecodeError) as e:
+        raise ValueError("Corrupted serialized schema") from e
+
+
+def _load_token(kind: tok.TokenKind, val: str, /) -> tok.Token:
+    interned = tok.INTERNED.get(val)
+    if interned is not None and interned.kind is kind:
+        return interned
+    return tok.Token(kind, val)
+
+
+class _Dumper:
+    __slots__ = ("ints", "strings", "token_ints", "_string_refs", "_token_refs")
+
+    def __init__(self, /) -> None:
+        self.ints = array("I")
+        self.strings: list[str] = []
+        self.token_ints: list[int] = []
+        self._string_refs: dict[str, int] = {}
+        self._token_refs: dict[tok.Token, int] = {}
+
+    def schema(self, schema: Schema, /) -> None:
+        self.ints.append(len(schema.items))
+        for item in schema.items:
+            if isinstance(item, Table):
+                self.ints.append(0)
+                self.table(item)
+            else:
+                self.ints.append(1)
+                self.index(item)
+
+    def table(self, table: Table, /) -> None:
+        self.names(table.name)
+        self.ints.append(len(table.columns))
+        for col in table.columns:
+            self.string(col.name)
+            self.column_type(col.type)
+            self.constraints(col.constraints)
+        self.constraints(table.constraints)
+        self.ints.append(
+            table.options.strict
+            | table.options.without_rowid << 1
+            | table.if_not_exists << 2
+            | table.or_replace << 3
+            | table.temporary << 4
+        )
+
+    def index(self, index: Index, /) -> None:
+        self.names(index.name)
+        self.string(index.table)
+        self.indexed(index.indexed)
+        if index.where is None:
+            self.ints.append(0)
+        else:
+            self.ints.append(len(index.where) + 1)
+            self.tokens(index.where)
+        self.ints.append(index.if_not_exists | index.unique << 1)
+
+    def column_type(self, ty: Type, /) -> None:
+        self.string(ty.name)
+        self.names(tuple(map(str, ty.params)))
+
+    def constraints(self, constraints: Iterable[ColumnConstraint], /) -> None:
+        constraints = tuple(constraints)
+        self.ints.append(len(constraints))
+        ints = self.ints
+        for x in constraints:
+            ints.append(_CONSTRAINT_TAGS[type(x)])
+            self.optional_string(x.name)
+            if isinstance(x, Uniqueness):
+                self.indexed(x.indexed)
+                ints.append(
+                    x.is_table_constraint | x.is_primary << 1 | x.autoincrement << 2
+                )
+                self.enum(x.on_conflict)
+            elif isinstance(x, ForeignKey):
+                ints.append(x.is_table_constraint)
+                self.names(x.columns)
+                self.names(x.foreign_table)
+                if x.referred_columns is None:
+                    ints.append(0)
+                else:
+                    ints.append(1)
+                    self.names(x.referred_columns)
+                self.enum(x.on_delete)
+                self.enum(x.on_update)
+                self.enum(x.match)
+                if x.enforcement is None:
+                    ints.append(0)
+                else:
+                    ints.append(1 + x.enforcement.not_deferrable)
+                    self.enum(x.enforcement.initially)
+            elif isinstance(x, Check):
+                ints.append(x.is_table_constraint)
+                self.expr(x.expr)
+            elif isinstance(x, Collation):
+                self.string(x.value)
+            elif isinstance(x, Default):
+                self.expr(x.expr)
+            elif isinstance(x, NotNull):
+                self.enum(x.on_conflict)
+            else:
+                self.expr(x.expr)
+                self.enum(x.kind)
+
+    def indexed(self, indexed: tuple[Indexed, ...], /) -> None:
+        self.ints.append(len(indexed))
+        for idx in indexed:
+            self.string(idx.column)
+            if idx.collation is None:
+                self.ints.append(0)
+            else:
+                self.ints.append(1)
+                self.optional_string(idx.collation.name)
+                self.string(idx.collation.value)
+            self.enum(idx.sorting)
+
+    def expr(self, expr: tuple[tok.Token, ...], /) -> None:
+        self.ints.append(len(expr))
+        self.tokens(expr)
+
+    def tokens(self, tokens: tuple[tok.Token, ...], /) -> None:
+        refs = self._token_refs
+        for tk in tokens:
+            ref = refs.get(tk)
+            if ref is None:
+                ref = refs[tk] = len(refs) + 1
+                self.token_ints.append(_TOKEN_KIND_ORDINALS[tk.kind])
+                self.token_ints.append(self._string_ref(tk.val))
+            self.ints.append(ref)
+
+    def names(self, names: tuple[str, ...], /) -> None:
+        self.ints.append(len(names))
+        for name in names:
+            self.string(name)
+
+    def string(self, val: str, /) -> None:
+        self.ints.append(self._string_ref(val))
+
+    def optional_string(self, val: str | None, /) -> None:
+        self.ints.append(0 if val is None else self._string_ref(val))
+
+    def enum(self, member: Enum | None, /) -> None:
+        self.ints.append(0 if member is None else _ORDINALS[member])
+
+    def _string_ref(self, val: str, /) -> int:
+        ref = self._string_refs.get(val)
+        if ref is None:
+            self.strings.append(val)
+            ref = self._string_refs[val] = len(self.strings)
+        return ref
+
+
+_EnumT = TypeVar("_EnumT", bound=Enum)
+
+
+class _Loader:
+    __slots__ = ("_ints", "_next", "_strings", "_tokens", "_types")
+
+    def __init__(
+        self, ints: "array[int]", strings: list[str], tokens: list[tok.Token], /
+    ) -> None:
+        self._ints = iter(ints)
+        self._next = self._ints.__next__
+        self._strings = strings
+        self._tokens = tokens
+        # Types by references to their name and parameters
+        self._types: dict[tuple[int, ...], Type] = {}
+
+    def at_end(self, /) -> bool:
+        """Were all integers read?"""
+        return next(self._ints, None) is None
+
+    def schema(self, /) -> Schema:
+        nxt = self._next
+        items: list[SchemaItem] = []
+        for _ in range(nxt()):
+            items.append(self.index() if nxt() else self.table())
+        return Schema(items=tuple(items))
+
+    def table(self, /) -> Table:
+        nxt = self._next
+        strings = self._strings
+        name = self.names()
+        columns = tuple(
+            Column(
+                name=strings[nxt()],
+                type=self.column_type(),
+                constraints=self.constraints(),
+            )
+            for _ in range(nxt())
+        )
+        constraints = self.constraints()
+        flags = nxt()
+        return Table(
+            name=name,
+            columns=columns,
+            constraints=constraints,  # type: ignore[arg-type]
+            options=canonical(
+                TableOptions(strict=bool(flags & 1), without_rowid=bool(flags & 2))
+            ),
+            if_not_exists=bool(flags & 4),
+            or_replace=bool(flags & 8),
+            temporary=bool(flags & 16),
+        )
+
+    def index(self, /) -> Index:
+        nxt = self._next
+        name = self.names()
+        table = self._strings[nxt()]
+        indexed = self.indexed()
+        where_len = nxt()
+        where = self.tokens(where_len - 1) if where_len else None
+        flags = nxt()
+        return Index(
+            name=name,
+            table=table,
+            indexed=indexed,
+            where=where,
+            if_not_exists=bool(flags & 1),
+            unique=bool(flags & 2),
+        )
+
+    def column_type(self, /) -> Type:
+        nxt = self._next
+        name_ref = nxt()
+        key = (name_ref, *[nxt() for _ in range(nxt())])
+        result = self._types.get(key)
+        if result is None:
+            params = tuple(int(self._strings[ref]) for ref in key[1:])
+            result = canonical(Type(name=self._strings[name_ref], params=params))
+            self._types[key] = result
+        return result
+
+    def constraints(self, /) -> tuple[ColumnConstraint, ...]:
+        nxt = self._next
+        return tuple(
+            self.constraint(nxt(), self.optional_string()) for _ in range(nxt())
+        )
+
+    def constraint(self, tag: int, name: str | None, /) -> ColumnConstraint:
+        # pylint: disable=too-many-return-statements
+        nxt = self._next
+        cls = _CONSTRAINT_TYPES[tag]
+        if cls is Uniqueness:
+            indexed = self.indexed()
+            flags = nxt()
+            return Uniqueness(
+                name=name,
+                is_table_constraint=bool(flags & 1),
+                indexed=indexed,
+                is_primary=bool(flags & 2),
+                autoincrement=bool(flags & 4),
+                on_conflict=self.enum(OnConflict),
+            )
+        if cls is ForeignKey:
+            is_table_constraint = bool(nxt())
+            columns = self.names()
+            foreign_table = self.names()
+            referred = self.names() if nxt() else None
+            on_delete = self.enum(OnUpdateDelete)
+            on_update = self.enum(OnUpdateDelete)
+            match = self.enum(Match)
+            enforcement = None
+            enforcement_flag = nxt()
+            if enforcement_flag:
+                enforcement = canonical(
+                    ConstraintEnforcement(
+                        not_deferrable=enforcement_flag == 2,
+                        initially=self.enum(ConstraintEnforcementTime),
+                    )
+                )
+            return ForeignKey(
+                name=name,
+                is_table_constraint=is_table_constraint,
+                columns=columns,
+                foreign_table=foreign_table,
+                referred_columns=referred,
+                on_delete=on_delete,
+                on_update=on_update,
+                match=match,
+                enforcement=enforcement,
+            )
+        if cls is Check:
+            is_table_constraint = bool(nxt())
+            return Check(
+                name=name, is_table_constraint=is_table_constraint, expr=self.expr()
+            )
+        if cls is Collation:
+            return canonical(Collation(name=name, value=self._strings[nxt()]))
+        if cls is Default:
+            return Default(name=name, expr=self.expr())
+        if cls is NotNull:
+            return canonical(NotNull(name=name, on_conflict=self.enum(OnConflict)))
+        expr = self.expr()
+        return Generated(name=name, expr=expr, kind=self.enum(GeneratedKind))
+
+    def indexed(self, /) -> tuple[Indexed, ...]:
+        nxt = self._next
+        strings = self._strings
+        result: list[Indexed] = []
+        for _ in range(nxt()):
+            column = strings[nxt()]
+            collation = None
+            if nxt():
+                collation_name = self.optional_string()
+                collation = canonical(
+                    Collation(name=collation_name, value=strings[nxt()])
+                )
+            result.append(
+                canonical(
+                    Indexed(
+                        column=column, collation=collation, sorting=self.enum(Sorting)
+                    )
+                )
+            )
+        return tuple(result)
+
+    def expr(self, /) -> tuple[tok.Token, ...]:
+        return self.tokens(self._next())
+
+    def tokens(self, count: int, /) -> tuple[tok.Token, ...]:
+        nxt = self._next
+        tokens = self._tokens
+        return tuple(tokens[nxt()] for _ in range(count))
+
+    def names(self, /) -> tuple[str, ...]:
+        nxt = self._next
+        strings = self._strings
+        return tuple(strings[nxt()] for _ in range(nxt()))
+
+    def optional_string(self, /) -> str | None:
+        ref = self._next()
+        return self._strings[ref] if ref else None
+
+    def enum(self, cls: type[_EnumT], /) -> _EnumT | None:
+        result: _EnumT | None = _ENUM_MEMBERS[cls][self._next()]
+        return result
@@ -5,8 +5,9 @@
 Representation of SQL tokens.
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Flag, unique, auto
+import sys
 
 
 class _ReprFlag(Flag):
@@ -73,20 +74,93 @@ class TokenKind(_ReprFlag):
     UNKNOWN_OR_TRIVIA = UNKNOWN | TRIVIA
 
 
+# Integer masks of token kinds, to classify tokens without `Flag` operations.
+# `tk.mask & ID_MASK` is a fast equivalent of `bool(tk.kind & TokenKind.ID)`.
+KEYWORD_MASK: int = TokenKind.KEYWORD.value
+NON_KW_ID_MASK: int = TokenKind.NON_KW_ID.value
+DELIMITED_ID_MASK: int = TokenKind.DELIMITED_ID.value
+ID_MASK: int = TokenKind.ID.value
+STR_MASK: int = TokenKind.STR.value
+BLOB_MASK: int = TokenKind.BLOB.value
+BINARY_MASK: int = TokenKind.BINARY.value
+HEX_MASK: int = TokenKind.HEX.value
+NUMERIC_MASK: int = TokenKind.NUMERIC.value
+LITERAL_MASK: int = TokenKind.LITERAL.value
+OPERATOR_MASK: int = TokenKind.OPERATOR.value
+COMMENT_MASK: int = TokenKind.COMMENT.value
+TRIVIA_MASK: int = TokenKind.TRIVIA.value
+UNKNOWN_MASK: int = TokenKind.UNKNOWN.value
+
+# Kinds of the values that are interned with `sys.intern`.
+# Names are repeated across a schema: equal names share a single `str`.
+# Interned strings that are no longer referenced are freed.
+_NAME_MASK: int = TokenKind.RAW_ID.value | TokenKind.DELIMITED_ID.value
+
+
 @dataclass(frozen=True, slots=True)
 class Token:
     kind: TokenKind
     val: str
+    # Integer value of `kind`
+    mask: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        mask = self.kind.value
+        object.__setattr__(self, "mask", mask)
+        if mask & _NAME_MASK:
+            object.__setattr__(self, "val", sys.intern(self.val))
+
+
+@dataclass(frozen=True, slots=True)
+class SpanToken:
+    """A token that references its value in the source instead of copying it.
+
+    The value is written as `src[start:end]`.
+    It is only built when `val` is read.
+    """
+
+    kind: TokenKind
+    src: str = field(repr=False)
+    start: int
+    end: int
+    # Integer value of `kind`
+    mask: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "mask", self.kind.value)
+
+    @property
+    def val(self) -> str:
+        val = unescape(self.kind, self.src[self.start : self.end])
+        return sys.intern(val) if self.mask & _NAME_MASK else val
+
+    def token(self) -> Token:
+        """Token that owns its value"""
+        return Token(self.kind, self.val)
+
+
+def unescape(kind: TokenKind, text: str, /) -> str:
+    """Value of a token of kind `kind` that is written as `text` in the source.
+
+    `text` excludes the delimiters of the token.
+    """
+    if kind is TokenKind.STD_STR:
+        return text.replace("''", "'")
+    if kind is TokenKind.STD_DELIMITED_ID:
+        return text.replace('""', '"')
+    if kind is TokenKind.FLOAT:
+        return text.replace("E", "e")
+    return text
 
 
-def is_not_trivia(tk: Token, /) -> bool:
+def is_not_trivia(tk: Token | SpanToken, /) -> bool:
     """Is `tk` kind a non-trivia kind?"""
-    return not bool(tk.kind & TokenKind.TRIVIA)
+    return not tk.mask & TRIVIA_MASK
 
 
-def like(a: Token, b: Token, /) -> bool:
+def like(a: Token | SpanToken, b: Token | SpanToken, /) -> bool:
     """Have `a` and `b` the same val and a compatible kind?"""
-    return bool(a.kind & b.kind) and a.val == b.val
+    return bool(a.mask & b.mask) and a.val == b.val
 
 
 # Spaces
@@ -0,0 +1,96 @@
+# Copyright (c) 2022 Victorien Elvinger
+# Licensed under the MIT License (https://mit-license.org/)
+
+import os
+import random
+import tempfile
+import pytest
+import sqlschm.cache
+from sqlschm.cache import SchemaCache
+from sqlschm.parser import parse_schema
+
+SRC = "CREATE TABLE t(a integer PRIMARY KEY, b text DEFAULT 'x' CHECK (b <> ''));"
+
+
+def test_schema_cache() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SchemaCache(directory=os.path.join(tmp, "cache"))
+        assert cache.parse_schema(SRC) == parse_schema(SRC)
+        (entry,) = os.listdir(cache.directory)
+        assert cache.parse_schema(SRC) == parse_schema(SRC)
+        assert cache.parse_schema(SRC, ddl_only=True) == parse_schema(SRC)
+        assert len(os.listdir(cache.directory)) == 2
+        # an unreadable entry is a miss
+        with open(os.path.join(cache.directory, entry), "wb") as fp:
+            fp.write(b"corrupted")
+        assert cache.parse_schema(SRC) == parse_schema(SRC)
+        cache.clear()
+        assert not os.listdir(cache.directory)
+
+
+def test_schema_cache_corrupted_entries() -> None:
+    rnd = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SchemaCache(directory=tmp)
+        cache.parse_schema(SRC)
+        (entry,) = os.listdir(tmp)
+        path = os.path.join(tmp, entry)
+        with open(path, "rb") as fp:
+            data = fp.read()
+        for _ in range(500):
+            corrupted = bytearray(data)
+            for _ in range(rnd.randint(1, 4)):
+                corrupted[rnd.randrange(len(corrupted))] = rnd.randrange(256)
+            if rnd.random() < 0.2:
+                del corrupted[rnd.randrange(len(corrupted)) :]
+            try:
+                sqlschm.sql.loads(bytes(corrupted))
+                continue  # still a valid serialized schema
+            except ValueError:
+                pass
+            with open(path, "wb") as fp:
+                fp.write(corrupted)
+            # an invalid entry is a miss that is replaced
+            assert cache.parse_schema(SRC) == parse_schema(SRC)
+            with open(path, "rb") as fp:
+                assert fp.read() == data
+
+
+def test_schema_cache_eviction() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "schema.sql")
+        with open(path, "w", encoding="utf-8") as fp:
+            fp.write(SRC)
+        cache = SchemaCache(directory=tmp, max_size=1)
+        assert cache.parse_schema_file(path) == parse_schema(SRC)
+        cache.parse_schema("CREATE TABLE u(c);")
+        assert os.listdir(tmp) == ["schema.sql"]
+
+
+def test_schema_cache_tmp_files() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SchemaCache(directory=tmp)
+        stale = os.path.join(tmp, "stale.tmp")
+        fresh = os.path.join(tmp, "fresh.tmp")
+        for path in (stale, fresh):
+            with open(path, "wb") as fp:
+                fp.write(b"partial entry")
+        os.utime(stale, (0, 0))
+        cache.parse_schema(SRC)
+        assert not os.path.exists(stale) and os.path.exists(fresh)
+        os.utime(fresh, (0, 0))
+        cache.clear()
+        assert not os.listdir(tmp)
+
+
+def test_schema_cache_read_only(monkeypatch: pytest.MonkeyPatch) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SchemaCache(directory=tmp)
+        cache.parse_schema(SRC)
+
+        def fail(*_: object) -> None:
+            raise PermissionError()
+
+        monkeypatch.setattr(os, "utime", fail)
+        monkeypatch.setattr(sqlschm.cache, "parse_schema", fail)
+        assert cache.parse_schema(SRC) == parse_schema(SRC)
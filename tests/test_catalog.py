@@ -0,0 +1,49 @@
+# Copyright (c) 2022 Victorien Elvinger
+# Licensed under the MIT License (https://mit-license.org/)
+
+import pytest
+from sqlschm import sql
+from sqlschm.catalog import SchemaCatalog
+from sqlschm.parser import parse_schema
+
+SRC = """
+CREATE TABLE t(a integer PRIMARY KEY, b text);
+CREATE TABLE u(c int REFERENCES t);
+CREATE INDEX i ON u(c);
+"""
+OTHER_SRC = """
+CREATE TABLE t(a integer PRIMARY KEY, b text);
+CREATE TABLE u(c int REFERENCES t, d);
+CREATE INDEX i ON u(c);
+"""
+
+
+def test_schema_catalog() -> None:
+    catalog: SchemaCatalog[str] = SchemaCatalog()
+    schema = catalog.add("x", parse_schema(SRC))
+    assert schema == parse_schema(SRC)
+    assert catalog.add("y", parse_schema(SRC)) is schema
+    other = catalog.add("z", parse_schema(OTHER_SRC))
+    assert other == parse_schema(OTHER_SRC)
+    assert other.items[0] is schema.items[0]
+    assert other.items[2] is schema.items[2]
+    assert len(catalog) == 3 and list(catalog) == ["x", "y", "z"]
+    assert "x" in catalog and catalog["z"] is other
+    assert len(list(catalog.tables())) == 3
+    t, u = schema.items[:2]
+    assert isinstance(t, sql.Table) and isinstance(u, sql.Table)
+    assert catalog.sharing(t) == ("x", "y", "z")
+    assert catalog.sharing(u) == ("x", "y")
+    assert catalog.versions("u") == {u: ("x", "y"), other.items[1]: ("z",)}
+    assert not catalog.versions("v")
+
+    catalog.remove("z")
+    assert catalog.versions("u") == {u: ("x", "y")}
+    catalog.add("x", parse_schema(OTHER_SRC))
+    assert catalog.sharing(u) == ("y",)
+    catalog.remove("x")
+    catalog.remove("y")
+    assert not list(catalog.tables())
+    assert not catalog.versions("t")
+    with pytest.raises(KeyError):
+        catalog.remove("x")
@@ -0,0 +1,120 @@
+# Copyright (c) 2022 Victorien Elvinger
+# Licensed under the MIT License (https://mit-license.org/)
+
+import sqlite3
+from sqlschm import generator, parser, sql
+
+
+def test_generate_schema() -> None:
+    schema = parser.parse_schema(
+        """
+        CREATE TABLE t(
+            a int CONSTRAINT pk PRIMARY KEY DESC,
+            b text DEFAULT (1 + 1),
+            c text DEFAULT -1,
+            d text DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX i ON t(b COLLATE nocase ASC);
+        """
+    )
+    src = generator.generate_schema(schema, sql.Dialect.SQLITE)
+    assert '"a" int CONSTRAINT "pk" PRIMARY KEY DESC,' in src
+    assert '"b" text DEFAULT (1 + 1),' in src
+    assert '"c" text DEFAULT - 1,' in src
+    assert '"d" text DEFAULT CURRENT_TIMESTAMP' in src
+    assert 'CREATE INDEX "i" ON "t"("b" COLLATE nocase ASC);' in src
+    assert parser.parse_schema(src) == schema
+    schema = parser.parse_schema(
+        'CREATE TABLE "t"" t"("a""b" text DEFAULT \'it\'\'s\' CHECK ("a""b" <> \'x\'));'
+    )
+    src = generator.generate_schema(schema, sql.Dialect.SQLITE)
+    assert 'CREATE TABLE "t"" t"(' in src
+    assert """"a""b" text DEFAULT 'it''s' CHECK ("a""b" <> 'x')""" in src
+    assert parser.parse_schema(src) == schema
+
+
+def migrate(old_src: str, new_src: str, /) -> str:
+    """Migrate a populated SQLite database and check its resulting schema"""
+    old = parser.parse_schema(old_src)
+    new = parser.parse_schema(new_src)
+    migration = generator.generate_migration(old, new, sql.Dialect.SQLITE)
+    db = sqlite3.connect(":memory:")
+    db.executescript(old_src)
+    db.execute("INSERT INTO t(a) VALUES (1)")
+    db.executescript(migration)
+    query = "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL"
+    migrated_src = "".join(f"{src};" for (src,) in db.execute(query))
+    migrated = parser.parse_schema(migrated_src)
+    assert sql.diff(migrated, new).is_empty()
+    for table in new.tables():
+        migrated_table = migrated.table(table.name[0])
+        assert migrated_table is not None
+        assert migrated_table.columns == table.columns
+    return migration
+
+
+def test_migration_alter() -> None:
+    assert migrate("CREATE TABLE t(a int);", "CREATE TABLE t(a int);") == ""
+    migration = migrate(
+        "CREATE TABLE t(a int PRIMARY KEY, b text);",
+        "CREATE TABLE t(a int PRIMARY KEY, c int NOT NULL DEFAULT 0, d REFERENCES t);",
+    )
+    assert migration.startswith("ALTER TABLE")
+    assert "new_t" not in migration
+    migration = migrate(
+        'CREATE TABLE t(a int, b text CHECK ("b" > 0));',
+        'CREATE TABLE t(a int, c text CHECK ("c" > 0));',
+    )
+    assert migration == 'ALTER TABLE "t" RENAME COLUMN "b" TO "c";'
+    migration = migrate("CREATE TABLE t(a int);", "CREATE TABLE t(b text);")
+    assert migration == (
+        'ALTER TABLE "t" ADD COLUMN "b" text;\nALTER TABLE "t" DROP COLUMN "a";'
+    )
+    migration = migrate(
+        """CREATE TABLE t(a int, "b""c" text DEFAULT 'it''s');""",
+        """CREATE TABLE t(a int, "d""e" text DEFAULT 'it''s');""",
+    )
+    assert migration == 'ALTER TABLE "t" RENAME COLUMN "b""c" TO "d""e";'
+    migration = migrate('CREATE TABLE t(a int, "b""c" int);', "CREATE TABLE t(a int);")
+    assert migration == 'ALTER TABLE "t" DROP COLUMN "b""c";'
+    migration = migrate(
+        "CREATE TABLE u(a int); CREATE TABLE t(a int REFERENCES u);",
+        "CREATE TABLE v(a int); CREATE TABLE t(a int REFERENCES v);",
+    )
+    assert migration == 'ALTER TABLE "u" RENAME TO "v";'
+    migration = migrate(
+        "CREATE TABLE t(a int, b int); CREATE INDEX i ON t(b);",
+        "CREATE TABLE t(a int);",
+    )
+    assert migration.splitlines() == [
+        'DROP INDEX "i";',
+        'ALTER TABLE "t" DROP COLUMN "b";',
+    ]
+
+
+def test_migration_rebuild() -> None:
+    for old_src, new_src in (
+        ("CREATE TABLE t(a int);", "CREATE TABLE t(a int) STRICT;"),
+        ("CREATE TABLE t(a int, b int UNIQUE);", "CREATE TABLE t(a int);"),
+        ("CREATE TABLE t(a int);", "CREATE TABLE t(a int, b int UNIQUE);"),
+        ("CREATE TABLE t(a int);", "CREATE TABLE t(a int NOT NULL);"),
+        (
+            "CREATE TABLE t(a int PRIMARY KEY);",
+            "CREATE TABLE t(a int PRIMARY KEY, b DEFAULT 0 REFERENCES t);",
+        ),
+        ("CREATE TABLE t(a int);", "CREATE TABLE t(a int, b DEFAULT (1 + 1));"),
+        (
+            "CREATE TABLE t(a int, b int); CREATE INDEX i ON t(b);",
+            "CREATE TABLE t(a int PRIMARY KEY, b int); CREATE INDEX i ON t(b);",
+        ),
+        ("CREATE TABLE t(a int, b int);", "CREATE TABLE t(b int, a int);"),
+        ("CREATE TABLE t(a int);", "CREATE TABLE t(b int, a int);"),
+        ("CREATE TABLE t(a int, b int);", "CREATE TABLE t(c int PRIMARY KEY);"),
+        (
+            """CREATE TABLE t(a int, "b""c" text DEFAULT 'it''s');""",
+            """CREATE TABLE t(a int NOT NULL, "b""c" text DEFAULT 'it''s');""",
+        ),
+    ):
+        migration = migrate(old_src, new_src)
+        assert 'CREATE TABLE "new_t"' in migration
+        assert migration.startswith("PRAGMA foreign_keys=OFF;")
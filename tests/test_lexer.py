@@ -1,6 +1,8 @@
 # Copyright (c) 2022 Victorien Elvinger
 # Licensed under the MIT License (https://mit-license.org/)
 
+import io
+import pytest
 from sqlschm import lexer, tok
 from sqlschm.tok import Token, TokenKind
 
@@ -140,3 +142,82 @@ def test_complex() -> None:
         tok.R_PAREN,
         tok.SEMICOLON,
     ]
+
+
+def test_str_and_chars() -> None:
+    srcs = [
+        "CREATE TABLE t(a int DEFAULT 1.5e-3, b DEFAULT x'ae', c DEFAULT b'01');",
+        "'unterminated ''str",
+        'x\'ae5 b"012" 0x 0xfg .5 5. 1E5 [id] `id` "a""b" -- c',
+        "/* c */ a<=b<<c||d!=e!f::g # c\n#",
+    ]
+    for src in srcs:
+        assert list(lexer.tokens(src)) == list(lexer.tokens(iter(src)))
+
+
+def test_span_tokens() -> None:
+    src = "CREATE TABLE t(\"a\"\"b\" DEFAULT 'it''s' CHECK (c > 1E5)); /* c */"
+    tks = list(lexer.span_tokens(src))
+    assert tok.SpanToken(TokenKind.MULTI_LINE_COMMENT, src, 58, 61) in tks
+    assert tok.CREATE in tks
+    owned = [tk.token() if isinstance(tk, tok.SpanToken) else tk for tk in tks]
+    assert owned == list(lexer.tokens(src))
+
+
+def test_token_buffer() -> None:
+    src = "CREATE TABLE t(\"a\"\"b\" DEFAULT 'it''s', c DEFAULT 0x); -- c\n'a''b"
+    buffer = lexer.token_buffer(src)
+    tks = [tk for tk in lexer.span_tokens(src) if tok.is_not_trivia(tk)]
+    assert list(buffer) == tks
+    assert list(buffer.slice(1, 3)) == tks[1:3]
+    cursor = lexer.BufferCursor(buffer, tok.SEMICOLON)
+    assert (cursor.item, cursor.next_item) == (tok.CREATE, tok.TABLE)
+    for _ in tks:
+        cursor.forth()
+    assert cursor.item is tok.SEMICOLON
+
+
+def test_token_buffer_large_offsets(monkeypatch: pytest.MonkeyPatch) -> None:
+    src = "CREATE TABLE t(a DEFAULT 'it''s');"
+    # Offsets of sources over 4 GiB do not fit in 4 bytes
+    monkeypatch.setattr(lexer, "_MAX_UINT32", 8)
+    buffer = lexer.token_buffer(src)
+    assert buffer.starts.typecode == buffer.ends.typecode == "Q"
+    assert list(buffer) == [
+        tk for tk in lexer.span_tokens(src) if tok.is_not_trivia(tk)
+    ]
+
+
+def test_tokens_from_stream() -> None:
+    src = "CREATE TABLE t(a DEFAULT 'a ''str''', b DEFAULT x'ae5') -- c\n/* a\nc */;"
+    for chunk_size in range(1, len(src) + 1):
+        tks = list(lexer.tokens_from_stream(io.StringIO(src), chunk_size=chunk_size))
+        assert tks == list(lexer.tokens(src))
+
+
+def test_tokens_from_bytes() -> None:
+    srcs = [
+        "CREATE TABLE t(a DEFAULT 'a ''str''', b DEFAULT x'ae5') -- c\n/* a\nc */;",
+        "CREATE TABLE café(prénom text DEFAULT 'été', [été] DEFAULT 1٣.5) -- ç",
+        "b'01' B\"01 x'ag' 0x 'unterminated é",
+    ]
+    for src in srcs:
+        data = src.encode("utf-8")
+        assert list(lexer.tokens_from_bytes(data)) == list(lexer.tokens(src))
+        assert list(lexer.tokens_from_bytes(memoryview(data))) == list(
+            lexer.tokens(src)
+        )
+
+
+def test_statements() -> None:
+    src = (
+        "INSERT INTO t VALUES('a;b', \"c;\", [d;]);-- e;\n"
+        "/* f; */ CREATE TRIGGER g AFTER INSERT ON t BEGIN SELECT 1; END;\n"
+        "COMMIT"
+    )
+    assert [src[start:end] for start, end in lexer.statements(src)] == [
+        "INSERT INTO t VALUES('a;b', \"c;\", [d;]);",
+        "-- e;\n/* f; */ CREATE TRIGGER g AFTER INSERT ON t BEGIN SELECT 1; END;",
+        "\nCOMMIT",
+    ]
+    assert len(list(lexer.statements(src, final=False))) == 2
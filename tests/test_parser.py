@@ -1,9 +1,23 @@
 # Copyright (c) 2022 Victorien Elvinger
 # Licensed under the MIT License (https://mit-license.org/)
 
+from concurrent.futures import ThreadPoolExecutor
+import dataclasses
 import os
+import tempfile
 import black
-from sqlschm.parser import parse_schema
+import pytest
+from sqlschm import generator, sql
+from sqlschm.parser import (
+    ParserError,
+    StatementMemo,
+    iter_schema_items,
+    parse_document,
+    parse_many,
+    parse_schema,
+    parse_schema_file,
+    reparse,
+)
 
 CORPUS = "tests_corpus/valid/"
 
@@ -22,3 +36,188 @@ def test_valid_schema() -> None:
             ast = parse_schema(schm_content)
             computed_content = black.format_str(repr(ast), mode=black.mode.Mode())
             assert computed_content == out_content
+
+
+def test_parse_schema_file() -> None:
+    for schm_name in os.listdir(CORPUS):
+        if schm_name.endswith(".sql"):
+            with open(CORPUS + schm_name, encoding="utf-8") as schm:
+                expected = parse_schema(schm.read())
+            assert parse_schema_file(CORPUS + schm_name, chunk_size=16) == expected
+            assert parse_schema_file(CORPUS + schm_name, use_mmap=True) == expected
+
+
+def test_parse_ddl_only() -> None:
+    dump = (
+        "PRAGMA foreign_keys=OFF;\nBEGIN TRANSACTION;\n"
+        "CREATE TABLE t(a text DEFAULT 'x;y');\n"
+        "INSERT INTO t VALUES('CREATE TABLE u(b);');\n"
+        "CREATE VIEW v AS SELECT a FROM t;\n"
+        "CREATE TRIGGER g AFTER INSERT ON t BEGIN INSERT INTO t VALUES(1); END;\n"
+        "CREATE UNIQUE INDEX i ON t(a);\nCOMMIT;\n"
+    )
+    expected = parse_schema(
+        "CREATE TABLE t(a text DEFAULT 'x;y'); CREATE UNIQUE INDEX i ON t(a);"
+    )
+    assert parse_schema(dump, ddl_only=True) == expected
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dump.sql")
+        with open(path, "w", encoding="utf-8") as fp:
+            fp.write(dump)
+        for chunk_size in (1, 7, 4096):
+            assert (
+                parse_schema_file(path, chunk_size=chunk_size, ddl_only=True)
+                == expected
+            )
+
+
+def test_parse_schema_workers() -> None:
+    srcs = []
+    for schm_name in sorted(os.listdir(CORPUS)):
+        if schm_name.endswith(".sql"):
+            with open(CORPUS + schm_name, encoding="utf-8") as schm:
+                srcs.append(schm.read())
+    src = "\n".join(srcs * 4)
+    assert parse_schema(src, workers=2) == parse_schema(src)
+    selected = parse_schema(src, workers=2, include=lambda name: name[0] == "contacts")
+    assert selected == parse_schema(src, include=["contacts"])
+    assert selected.items
+    invalid = src + "CREATE TABLE t(a CHECK);" + src + "CREATE TABLE u(b"
+    with pytest.raises(ParserError) as serial_err:
+        parse_schema(invalid)
+    with pytest.raises(ParserError) as parallel_err:
+        parse_schema(invalid, workers=2)
+    assert str(parallel_err.value) == str(serial_err.value)
+
+
+def test_parse_many() -> None:
+    paths = sorted(
+        CORPUS + schm_name
+        for schm_name in os.listdir(CORPUS)
+        if schm_name.endswith(".sql")
+    )
+    expected = [(path, parse_schema_file(path)) for path in paths]
+    assert list(parse_many(paths, chunksize=1024)) == expected
+    missing = CORPUS + "missing.sql"
+    results = dict(parse_many([paths[0], missing, paths[-1]]))
+    assert isinstance(results.pop(missing), FileNotFoundError)
+    assert results == dict(expected[:1] + expected[-1:])
+    sources = {"valid": "CREATE TABLE t(a);", "invalid": "CREATE TABLE t(a CHECK);"}
+    with ThreadPoolExecutor() as executor:
+        results = dict(parse_many(sources, executor=executor, ordered=False))
+    assert results["valid"] == parse_schema(sources["valid"])
+    assert isinstance(results["invalid"], ParserError)
+
+
+def test_iter_schema_items() -> None:
+    items = iter_schema_items("CREATE TABLE t(a); CREATE INDEX i ON t(a); CREATE")
+    assert next(items) == parse_schema("CREATE TABLE t(a);").items[0]
+    assert isinstance(next(items), sql.Index)
+    with pytest.raises(ParserError):
+        next(items)
+
+
+def test_shared_names() -> None:
+    schema = parse_schema("CREATE TABLE a(id int); CREATE TABLE b(id INT);")
+    col_a, col_b = (tbl.columns[0] for tbl in schema.tables())
+    assert col_a.name is col_b.name
+    assert col_a.type is col_b.type
+
+
+def test_parse_schema_lazy() -> None:
+    for schm_name in os.listdir(CORPUS):
+        if schm_name.endswith(".sql"):
+            with open(CORPUS + schm_name, encoding="utf-8") as schm:
+                src = schm.read()
+            lazy_schema = parse_schema(src, lazy=True)
+            assert lazy_schema == parse_schema(src)
+            assert repr(lazy_schema) == repr(parse_schema(src))
+    lazy_table = parse_schema("CREATE TABLE t(a, b);", lazy=True).table("t")
+    assert lazy_table is not None
+    assert lazy_table.column("b") == sql.Column(name="b")
+    schema = parse_schema("CREATE TABLE t(a CHECK); CREATE INDEX i ON t(", lazy=True)
+    assert [item.name for item in schema.items] == [("t",), ("i",)]
+    assert [index.table for index in schema.indexes()] == ["t"]
+    with pytest.raises(ParserError):
+        list(schema.tables())[0].column("a")
+    src = "CREATE TABLE t(a int); CREATE INDEX i ON t(a);"
+    schema = parse_schema(src, lazy=True)
+    table, index = schema.table("t"), next(iter(schema.indexes()))
+    assert table is not None
+    assert dataclasses.replace(table, name=("u",)) == sql.Table(
+        name=("u",), columns=(sql.Column(name="a", type=sql.Type(name="INT")),)
+    )
+    assert dataclasses.replace(index, table="u") == sql.Index(
+        name=("i",), table="u", indexed=(sql.Indexed(column="a"),), where=None
+    )
+    new_src = "CREATE TABLE u(a int); CREATE INDEX i ON u(a);"
+    migration = generator.generate_migration(
+        parse_schema(src, lazy=True),
+        parse_schema(new_src, lazy=True),
+        sql.Dialect.SQLITE,
+    )
+    assert migration == 'ALTER TABLE "t" RENAME TO "u";'
+
+
+def test_parse_schema_include() -> None:
+    src = (
+        "CREATE TABLE t(a text DEFAULT (1 + (2)));"
+        "CREATE TABLE u(b CHECK (b > 0), c REFERENCES t(a));"
+        "CREATE INDEX main.i ON u(b);"
+        "CREATE INDEX j ON t(a);"
+    )
+    full = parse_schema(src)
+    expected = sql.Schema(items=(full.items[1], full.items[2]))
+    assert parse_schema(src, include={"u"}) == expected
+    assert parse_schema(src, include=lambda name: name == ("u", "main")) == sql.Schema(
+        items=(full.items[2],)
+    )
+    assert parse_schema(src, include=["u"], lazy=True) == expected
+    assert parse_schema(src, include=["u"], ddl_only=True) == expected
+    assert not list(iter_schema_items(src, include=()))
+
+
+def test_statement_memo() -> None:
+    src = "CREATE TABLE t(a CHECK (a > 0)); CREATE TABLE t(a CHECK (a > 0));"
+    memo = StatementMemo()
+    schema = parse_schema(src, memo=memo)
+    assert schema == parse_schema(src)
+    assert schema.items[0] is schema.items[1]
+    reformatted = "create table t( a  CHECK(a>0) ) /* c */;"
+    assert parse_schema(reformatted, memo=memo).items[0] is schema.items[0]
+    assert next(iter_schema_items(reformatted, memo=memo)) is schema.items[0]
+    memo = StatementMemo(max_size=1)
+    parse_schema("CREATE TABLE t(a); CREATE TABLE u(b);", memo=memo)
+    assert len(memo) == 1
+    src = "CREATE TABLE t(a); CREATE TABLE u(b); CREATE INDEX i ON u(b);"
+    for selected_src in (src, [src]):
+        memo = StatementMemo()
+        selected = parse_schema(selected_src, include=["u"], memo=memo)
+        assert selected == parse_schema(src, include=["u"])
+        assert len(memo) >= 2
+        again = parse_schema(selected_src, include=["u"], memo=memo)
+        assert again.items[0] is selected.items[0]
+        assert not parse_schema(selected_src, include=["v"], memo=memo).items
+
+
+def test_reparse() -> None:
+    src = "CREATE TABLE t(a); CREATE TABLE u(b); /* c */ CREATE INDEX i ON t(a);"
+    doc = parse_document(src)
+    assert doc.schema() == parse_schema(src)
+    edited = reparse(doc, src.index("b)"), src.index("b)") + 1, "c CHECK (c > 0)")
+    assert edited.src == src.replace("b)", "c CHECK (c > 0))")
+    assert edited == parse_document(edited.src)
+    assert edited.statements[0].item is doc.statements[0].item
+    assert edited.statements[2].item is doc.statements[2].item
+    broken = reparse(edited, len("CREATE TABLE t(a)"), len("CREATE TABLE t(a);"), "")
+    assert len(list(broken.errors())) == 1
+    with pytest.raises(ParserError):
+        broken.schema()
+    fixed = reparse(broken, len("CREATE TABLE t(a)"), len("CREATE TABLE t(a)"), ";")
+    assert fixed.schema() == edited.schema()
+
+
+def test_unterminated_parens() -> None:
+    for src in ("CREATE TABLE t(a CHECK (a", "CREATE INDEX i ON t(a) WHERE a"):
+        with pytest.raises(ParserError):
+            parse_schema(src)
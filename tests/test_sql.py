@@ -1,7 +1,12 @@
 # Copyright (c) 2022 Victorien Elvinger
 # Licensed under the MIT License (https://mit-license.org/)
 
-from sqlschm import sql
+import dataclasses
+import struct
+from array import array
+import pytest
+from sqlschm import sql, tok
+from sqlschm.parser import parse_schema
 
 TABLE_A = sql.Table(
     name=("A",),
@@ -51,7 +56,11 @@ SCHEMA = sql.Schema(items=(TABLE_A, TABLE_B, TABLE_C, TABLE_D))
 
 
 def test_symbols() -> None:
-    assert sql.symbols(SCHEMA) == SYMBOLS
+    syms = sql.symbols(SCHEMA)
+    assert syms == SYMBOLS
+    assert syms["A"] is SCHEMA.table("A")
+    with pytest.raises(TypeError):
+        syms["E"] = TABLE_A  # type: ignore[index]
 
 
 def test_referred_columns() -> None:
@@ -71,3 +80,161 @@ def test_resolve_foreign_key() -> None:
         FK_A,
         "a",
     )
+
+
+def test_canonical() -> None:
+    int_type = sql.canonical(sql.Type(name="INTEGER"))
+    assert sql.canonical(sql.Type(name="INTEGER")) is int_type
+    assert sql.canonical(sql.Type(name="INTEGER", params=(1,))) is not int_type
+    not_null = sql.canonical(sql.NotNull(on_conflict=sql.OnConflict.ABORT))
+    assert sql.canonical(sql.NotNull(on_conflict=sql.OnConflict.ABORT)) is not_null
+    assert sql.canonical(sql.NotNull()) is not not_null
+
+
+def test_lookups() -> None:
+    index = sql.Index(
+        name=("i",), table="C", indexed=(sql.Indexed(column="a"),), where=None
+    )
+    schema = sql.Schema(items=(TABLE_A, TABLE_C, index))
+    assert schema.table("C") is TABLE_C
+    assert schema.table("B") is None
+    assert schema.indexes_for("C") == (index,)
+    assert schema.indexes_for("A") == ()
+    assert TABLE_C.column("b") is TABLE_C.columns[1]
+    assert TABLE_C.column("z") is None
+    assert schema == sql.Schema(items=(TABLE_A, TABLE_C, index))
+    assert "_tables_by_name" not in repr(schema)
+
+
+def test_constraint_partitions() -> None:
+    not_null = sql.NotNull()
+    col = sql.Column(name="a", constraints=(not_null, FK_A))
+    assert col.not_null() is not_null
+    assert col.default() is None
+    assert tuple(col.table_constraints()) == (FK_A,)
+    table = sql.Table(name=("T",), columns=(col,), constraints=TABLE_A.constraints)
+    assert table.primary_key() is TABLE_A.constraints[0]
+    assert tuple(table.all_constraints()) == (FK_A, TABLE_A.constraints[0])
+    assert tuple(table.foreign_keys()) == (FK_A,)
+    assert not tuple(table.checks())
+    assert table.uniqueness() is table.uniqueness()
+
+
+def test_foreign_key_graph() -> None:
+    graph = sql.ForeignKeyGraph(SCHEMA)
+    assert graph.references("C") == (FK_A, FK_B)
+    assert graph.referrers("C") == (("D", FK_C),)
+    assert graph.resolve("D", "x") == ("B", "b")
+    assert graph.resolve("D", "y") == ("A", "a")
+    assert graph.resolve("A", "a") == ("A", "a")
+    assert not graph.cycles()
+    order = [tbl.name[0] for tbl in graph.topological_order()]
+    assert order.index("C") > order.index("A") and order.index("D") > order.index("C")
+    fk_self = sql.ForeignKey(
+        columns=("b",), foreign_table=("E",), referred_columns=("a",)
+    )
+    fk_e = sql.ForeignKey(columns=("a",), foreign_table=("F",), referred_columns=("a",))
+    fk_f = sql.ForeignKey(columns=("a",), foreign_table=("E",), referred_columns=("a",))
+    cols = (sql.Column(name="a"), sql.Column(name="b"))
+    table_e = sql.Table(name=("E",), columns=cols, constraints=(fk_self, fk_e))
+    table_f = sql.Table(name=("F",), columns=cols, constraints=(fk_f,))
+    graph = sql.ForeignKeyGraph(sql.Schema(items=(TABLE_A, table_e, table_f)))
+    assert graph.cycles() == (("E", "F"),)
+    with pytest.raises(ValueError):
+        graph.topological_order()
+    with pytest.raises(ValueError):
+        graph.resolve("E", "b")
+    self_graph = sql.ForeignKeyGraph(sql.Schema(items=(TABLE_A, table_e)))
+    assert self_graph.cycles() == (("E",),)
+    assert self_graph.topological_order() == (TABLE_A, table_e)
+
+
+def test_fingerprint() -> None:
+    copy = sql.Schema(items=tuple(dataclasses.replace(x) for x in SCHEMA.items))
+    assert sql.fingerprint(copy) == sql.fingerprint(SCHEMA)
+    assert copy == SCHEMA and hash(copy) == hash(SCHEMA)
+    other = sql.Schema(items=(TABLE_A, TABLE_B, TABLE_D, TABLE_C))
+    assert sql.fingerprint(other) != sql.fingerprint(SCHEMA)
+    assert other != SCHEMA
+    assert sql.fingerprint(FK_A) != sql.fingerprint(FK_B)
+    assert len(sql.fingerprint(TABLE_A)) == 16
+
+
+def test_diff() -> None:
+    assert sql.diff(SCHEMA, SCHEMA).is_empty()
+    col_z = sql.Column(name="z")
+    new_c = dataclasses.replace(
+        TABLE_C,
+        columns=(sql.Column(name="a", type=sql.Type(name="INT")), col_z),
+        constraints=TABLE_C.constraints[:2],
+    )
+    index = sql.Index(
+        name=("i",), table="A", indexed=(sql.Indexed(column="a"),), where=None
+    )
+    changes = sql.diff(SCHEMA, sql.Schema(items=(TABLE_A, new_c, TABLE_D, index)))
+    assert not changes.added_tables
+    assert changes.dropped_tables == (TABLE_B,)
+    assert changes.added_indexes == (index,)
+    (table_diff,) = changes.modified_tables
+    assert (table_diff.old, table_diff.new) == (TABLE_C, new_c)
+    assert table_diff.added_columns == (col_z,)
+    assert table_diff.dropped_columns == (TABLE_C.columns[1],)
+    assert table_diff.modified_columns == ((TABLE_C.columns[0], new_c.columns[0]),)
+    assert table_diff.dropped_constraints == (FK_B,)
+    assert not table_diff.added_constraints
+    old = parse_schema("CREATE TABLE t(a int); CREATE TABLE u(b text);")
+    new = parse_schema("CREATE TABLE t(a int); CREATE TABLE u(c text);")
+    assert len(sql.diff(old, new).modified_tables) == 1
+    # pylint: disable-next=protected-access
+    assert all(table._fingerprint is not None for table in new.tables())
+
+
+def test_dumps() -> None:
+    assert sql.loads(sql.dumps(SCHEMA)) == SCHEMA
+    schema = parse_schema(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS t(
+            a integer PRIMARY KEY DESC ON CONFLICT ABORT AUTOINCREMENT,
+            b varchar(40) NOT NULL COLLATE nocase DEFAULT 'é',
+            c int CONSTRAINT fk REFERENCES t(a) ON DELETE SET NULL MATCH FULL
+                DEFERRABLE INITIALLY DEFERRED,
+            d GENERATED ALWAYS AS (a + 1) STORED,
+            UNIQUE (b COLLATE binary ASC, c),
+            CHECK (c <> -1)
+        ) STRICT, WITHOUT ROWID;
+        CREATE UNIQUE INDEX i ON t(b DESC) WHERE b IS NOT NULL;
+        """
+    )
+    data = sql.dumps(schema)
+    loaded = sql.loads(data)
+    assert loaded == schema
+    assert sql.dumps(loaded) == data
+    index = loaded.items[1]
+    assert isinstance(index, sql.Index) and index.where is not None
+    assert tok.NULL in index.where
+    wide = sql.Table(name=tuple(f"n{i}" for i in range(300)), columns=())
+    wide_schema = sql.Schema(items=(wide,))
+    assert sql.loads(sql.dumps(wide_schema)) == wide_schema
+    with pytest.raises(ValueError):
+        sql.loads(b"sqlschm")
+    with pytest.raises(ValueError):
+        sql.loads(b"corrupted data")
+    with pytest.raises(ValueError):
+        sql.loads(data[:-20])
+    with pytest.raises(ValueError):
+        sql.loads(data + b"x")
+    # One more integer than the schema uses
+    header = struct.Struct("<7sBcIII")
+    *fields, int_count = header.unpack_from(data)
+    assert fields[2] == b"B"  # token kinds are small ordinals
+    ints_end = header.size + int_count * array(fields[2].decode()).itemsize
+    extended = header.pack(*fields, int_count + 1) + data[header.size : ints_end]
+    with pytest.raises(ValueError):
+        sql.loads(extended + bytes(array(fields[2].decode(), [0])) + data[ints_end:])
+    # Consistent header and strings, but missing integers
+    itemsize = array(fields[2].decode()).itemsize
+    for count in range(int_count):
+        truncated = header.pack(*fields, count)
+        truncated += data[header.size : header.size + count * itemsize]
+        with pytest.raises(ValueError):
+            sql.loads(truncated + data[ints_end:])
@@ -7,3 +7,31 @@ from sqlschm import tok
 def test_interned_consistent_val() -> None:
     for val, token in tok.INTERNED.items():
         assert token.val == val
+
+
+def test_span_token() -> None:
+    src = "'it''s'"
+    span_tk = tok.SpanToken(tok.TokenKind.STD_STR, src, 1, 6)
+    assert span_tk.val == "it's"
+    assert span_tk.token() == tok.Token(tok.TokenKind.STD_STR, "it's")
+    assert "src" not in repr(span_tk)
+
+
+def test_mask() -> None:
+    token = tok.Token(tok.TokenKind.STD_DELIMITED_ID, "a")
+    assert token.mask & tok.STR_MASK and token.mask & tok.ID_MASK
+    assert not token.mask & tok.TRIVIA_MASK
+    assert "mask" not in repr(token)
+    span_tk = tok.SpanToken(tok.TokenKind.STD_STR, "'a'", 1, 2)
+    assert span_tk.mask & tok.LITERAL_MASK
+    for kind in tok.TokenKind:
+        assert bool(tok.Token(kind, "").mask & tok.ID_MASK) == bool(
+            kind & tok.TokenKind.ID
+        )
+
+
+def test_interned_names() -> None:
+    src = "tenant_id tenant_id"
+    name = tok.Token(tok.TokenKind.RAW_ID, src[:9]).val
+    assert tok.Token(tok.TokenKind.RAW_ID, src[10:]).val is name
+    assert tok.SpanToken(tok.TokenKind.RAW_ID, src, 10, 19).val is name